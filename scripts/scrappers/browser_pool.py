@@ -0,0 +1,200 @@
+"""
+Pool of long-lived headless Chrome drivers fed from a shared work queue
+
+Each worker thread owns one driver. Drivers are recycled after a number of
+pages or once the browser's memory grows past a limit, and a worker whose
+browser crashes starts a fresh one and puts its URL back on the queue, so
+no URL is lost. A shared HostRateLimiter keeps the global request rate
+inside the same budget as a single browser with sleeps.
+"""
+
+import logging
+import queue
+import threading
+
+log = logging.getLogger(__name__)
+
+# Substrings WebDriver uses when the browser itself (not the page) is gone
+CRASH_MARKERS = (
+    'invalid session id',
+    'session deleted',
+    'chrome not reachable',
+    'disconnected',
+    'no such window',
+    'tab crashed',
+    'target window already closed',
+)
+
+
+def is_driver_crash(error):
+    """
+    True when an exception means the driver must be replaced
+    """
+    if type(error).__name__ == 'InvalidSessionIdException':
+        return True
+    message = str(error).lower()
+    return any(marker in message for marker in CRASH_MARKERS)
+
+
+def driver_memory_mb(driver):
+    """
+    Memory used by a driver's browser: RSS of the whole process tree when
+    psutil is installed, otherwise the page's JS heap
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    try:
+        if psutil is not None:
+            process = psutil.Process(driver.service.process.pid)
+            rss = sum(p.memory_info().rss for p in [process] + process.children(recursive=True))
+            return rss / (1024 * 1024)
+        heap = driver.execute_script(
+            "return performance.memory ? performance.memory.usedJSHeapSize : 0"
+        )
+        return (heap or 0) / (1024 * 1024)
+    except Exception:
+        return 0
+
+
+class BrowserPool:
+    """
+    driver_factory: callable returning a new WebDriver (e.g. setup_driver)
+    size: number of browsers rendering at once
+    max_pages_per_driver: recycle a browser after this many pages
+    max_memory_mb: recycle a browser once it uses more than this
+    rate_limiter: optional HostRateLimiter shared by every worker
+    max_attempts: times a URL is retried on a crashed browser
+    """
+
+    def __init__(self, driver_factory, size=2, max_pages_per_driver=50, max_memory_mb=1500,
+                 rate_limiter=None, max_attempts=3):
+        self.driver_factory = driver_factory
+        self.size = size
+        self.max_pages_per_driver = max_pages_per_driver
+        self.max_memory_mb = max_memory_mb
+        self.rate_limiter = rate_limiter
+        self.max_attempts = max_attempts
+        self.drivers_started = 0
+        self.crashes = 0
+        self._lock = threading.Lock()
+
+    def _start_driver(self):
+        driver = self.driver_factory()
+        with self._lock:
+            self.drivers_started += 1
+        return driver
+
+    @staticmethod
+    def _quit(driver):
+        if driver is None:
+            return
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    def _needs_recycle(self, driver, pages):
+        if pages >= self.max_pages_per_driver:
+            return True
+        return bool(self.max_memory_mb) and driver_memory_mb(driver) > self.max_memory_mb
+
+    def _worker(self, work, results, scrape_fn, on_failure):
+        driver = None
+        pages = 0
+        try:
+            while True:
+                item = work.get()
+                if item is None:
+                    break
+                index, url, attempts = item
+
+                try:
+                    if driver is None:
+                        driver = self._start_driver()
+                        pages = 0
+                    if self.rate_limiter is not None:
+                        self.rate_limiter.wait(url)
+                    result = scrape_fn(driver, url)
+                except Exception as e:
+                    with self._lock:
+                        self.crashes += 1
+                    log.warning("  💥 Browser crashed on %s: %s", url, e)
+                    self._quit(driver)
+                    driver = None
+                    if attempts + 1 < self.max_attempts:
+                        work.put((index, url, attempts + 1))
+                        continue
+                    result = on_failure(url, e)
+
+                results.put((index, url, result))
+
+                if driver is not None:
+                    pages += 1
+                    if self._needs_recycle(driver, pages):
+                        log.debug("  ♻️  Recycling browser after %d pages", pages)
+                        self._quit(driver)
+                        driver = None
+        finally:
+            self._quit(driver)
+
+    def start(self, work, results, scrape_fn, on_failure):
+        """
+        Start the worker threads on caller-owned queues: they take
+        (index, url, 0) items from work and put (index, url, result) on
+        results until stop() is called. Returns the threads for stop().
+        """
+        workers = [
+            threading.Thread(target=self._worker, args=(work, results, scrape_fn, on_failure), daemon=True)
+            for _ in range(self.size)
+        ]
+        for worker in workers:
+            worker.start()
+        return workers
+
+    @staticmethod
+    def stop(work, workers):
+        """
+        Drop work nobody will collect, then shut the workers and their browsers down
+        """
+        while True:
+            try:
+                work.get_nowait()
+            except queue.Empty:
+                break
+        for _ in workers:
+            work.put(None)
+        for worker in workers:
+            worker.join()
+
+    def run(self, urls, scrape_fn, on_failure):
+        """
+        Render urls with scrape_fn(driver, url), yielding (index, url, result)
+        in completion order. on_failure(url, error) builds the result for a
+        URL whose browser crashed max_attempts times.
+        """
+        work = queue.Queue()
+        results = queue.Queue()
+        workers = self.start(work, results, scrape_fn, on_failure)
+
+        url_iter = enumerate(urls)
+        window = self.size * 2
+        outstanding = 0
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and outstanding < window:
+                    item = next(url_iter, None)
+                    if item is None:
+                        exhausted = True
+                        break
+                    work.put((item[0], item[1], 0))
+                    outstanding += 1
+                if outstanding == 0:
+                    break
+                yield results.get()
+                outstanding -= 1
+        finally:
+            self.stop(work, workers)
@@ -0,0 +1,140 @@
+"""
+Opt-in compressed per-URL page capture store
+
+Replaces the debug_page.html / selenium_debug.html dumps, which cost a
+prettify pass and a synchronous write per page and kept only the last page.
+Each URL gets its own compressed raw body plus a JSON metadata file. Pages
+are handed to a background writer thread through a bounded queue; when the
+queue is full the capture is dropped rather than slowing the fetch loop.
+"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+def _compressor(compression):
+    if compression == 'gzip':
+        return '.gz', lambda data: gzip.compress(data, compresslevel=5)
+    if compression == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd captures need the 'zstandard' package (pip install zstandard)")
+        compressor = zstandard.ZstdCompressor(level=6)
+        return '.zst', compressor.compress
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+class CaptureStore:
+    """
+    directory: where captures are written
+    compression: 'gzip' or 'zstd'
+    max_entries: retention cap, the oldest captures are deleted beyond it
+    queue_size: captures waiting for the writer before new ones are dropped
+    """
+
+    def __init__(self, directory='page_captures', compression='gzip', max_entries=1000, queue_size=256):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.suffix, self._compress = _compressor(compression)
+        self.written = 0
+        self.dropped = 0
+        os.makedirs(directory, exist_ok=True)
+
+        # Oldest first, so retention can delete from the front
+        existing = [name[:-5] for name in os.listdir(directory) if name.endswith('.json')]
+        existing.sort(key=lambda key: os.path.getmtime(os.path.join(directory, key + '.json')))
+        self._keys = dict.fromkeys(existing)
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(target=self._run, name='capture-writer', daemon=True)
+        self._writer.start()
+
+    def capture(self, url, body, metadata=None):
+        """
+        Queue a page for writing; never blocks the caller
+        body: raw page bytes (str is encoded as UTF-8)
+        """
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        try:
+            self._queue.put_nowait((url, body, dict(metadata or {}), time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                break
+            try:
+                self._write(*item)
+            except OSError as e:
+                log.warning("  ⚠️  Capture write failed: %s", e)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, url, body, metadata, captured_at):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        body_path = os.path.join(self.directory, key + self.suffix)
+        with open(body_path, 'wb') as f:
+            f.write(self._compress(body))
+
+        metadata.update({
+            'url': url,
+            'captured_at': captured_at,
+            'size': len(body),
+            'file': os.path.basename(body_path),
+        })
+        with open(os.path.join(self.directory, key + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, ensure_ascii=False)
+
+        self._keys.pop(key, None)
+        self._keys[key] = None
+        self.written += 1
+        self._enforce_retention()
+
+    def _enforce_retention(self):
+        while len(self._keys) > self.max_entries:
+            oldest = next(iter(self._keys))
+            del self._keys[oldest]
+            for suffix in ('.json', '.gz', '.zst'):
+                try:
+                    os.remove(os.path.join(self.directory, oldest + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def close(self):
+        """
+        Flush queued captures and stop the writer
+        """
+        self._queue.put(None)
+        self._writer.join()
+
+
+def load_capture(directory, url):
+    """
+    Return (body bytes, metadata) for a captured URL, or None
+    """
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    meta_path = os.path.join(directory, key + '.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        metadata = json.load(f)
+    with open(os.path.join(directory, metadata['file']), 'rb') as f:
+        data = f.read()
+    if metadata['file'].endswith('.zst'):
+        import zstandard
+        body = zstandard.ZstdDecompressor().decompress(data)
+    else:
+        body = gzip.decompress(data)
+    return body, metadata
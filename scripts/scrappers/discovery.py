@@ -0,0 +1,245 @@
+"""
+Attraction discovery for a TripAdvisor geo
+
+Builds the attraction URL list instead of hard-coding it: the geo's
+listing pages (Attractions-g189852-Activities-oa30-Stockholm.html, 30
+attractions a page) are fetched concurrently, the d-ids are pulled out
+with a regex and deduplicated in a bitmap, and every new attraction URL
+is handed straight to the duration scraper. Listing and detail fetches
+overlap and share one rate limit, cache and retry policy.
+Usage: python3 discovery.py
+"""
+
+import logging
+import queue
+import re
+import threading
+from functools import partial
+from urllib.parse import urljoin
+
+import requests
+
+import scraper2
+from fetch_engine import HostRateLimiter, run_concurrently
+from metrics import METRICS
+from results_store import ResultsStore
+from retry_policy import RetryPolicy, RetryableError
+
+log = logging.getLogger(__name__)
+
+BASE_URL = 'https://www.tripadvisor.com'
+PAGE_SIZE = 30
+
+# Groups: geo id, location id
+ATTRACTION_LINK_RE = re.compile(r'/Attraction_Review-g(\d+)-d(\d+)-Reviews-[^"\'#?\s<>]*?\.html')
+# Groups: geo id, offset
+LISTING_OFFSET_RE = re.compile(r'Attractions-g(\d+)-Activities-oa(\d+)-')
+
+
+def listing_url(geo_id, offset=0, city='', base_url=BASE_URL):
+    """
+    Listing page URL for a geo; page 1 has no -oaN- part
+    """
+    page = f"-oa{offset}" if offset else ''
+    slug = f"-{city}" if city else ''
+    return f"{base_url}/Attractions-g{geo_id}-Activities{page}{slug}.html"
+
+
+class LocationIdSet:
+    """
+    Set of d-ids kept as a bitmap that grows to the largest id seen:
+    about 4 MB covers every current TripAdvisor id, however many are added,
+    where a set of ints costs ~70 bytes per entry
+    """
+
+    def __init__(self):
+        self._bits = bytearray()
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, location_id):
+        """
+        Add an id, return True when it was not in the set yet
+        """
+        byte, bit = divmod(location_id, 8)
+        with self._lock:
+            if byte >= len(self._bits):
+                self._bits.extend(bytes(max(byte + 1, 2 * len(self._bits)) - len(self._bits)))
+            if self._bits[byte] & (1 << bit):
+                return False
+            self._bits[byte] |= 1 << bit
+            self.count += 1
+            return True
+
+    def __contains__(self, location_id):
+        byte, bit = divmod(location_id, 8)
+        return byte < len(self._bits) and bool(self._bits[byte] & (1 << bit))
+
+    def __len__(self):
+        return self.count
+
+
+def parse_listing(html, geo_id=None):
+    """
+    Return ([(location_id, path), ...] in page order, highest -oaN- offset
+    linked from the pagination or None)
+    geo_id: keep only links of this geo; listing pages also link "nearby"
+    and "related" attractions and listings of other cities
+    """
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+    geo = None if geo_id is None else str(geo_id)
+    links = [(int(match.group(2)), match.group(0)) for match in ATTRACTION_LINK_RE.finditer(html)
+             if geo is None or match.group(1) == geo]
+    offsets = [int(offset) for link_geo, offset in LISTING_OFFSET_RE.findall(html)
+               if geo is None or link_geo == geo]
+    return links, max(offsets) if offsets else None
+
+
+def fetch_listing(url, geo_id=None, cache=None, rate_limiter=None, retry_policy=None):
+    """
+    Fetch and parse one listing page; a failed page counts as empty
+    """
+    try:
+        response = scraper2.fetch_page(url, cache, rate_limiter, retry_policy)
+        with METRICS.timer('parse'):
+            return parse_listing(response.content, geo_id)
+    except RetryableError:
+        raise
+    except requests.exceptions.RequestException as e:
+        log.warning("  ✗ Listing page failed: %s (%s)", url, e)
+        return [], None
+
+
+def listing_failed(url, error):
+    log.warning("  ✗ Listing page failed: %s (%s)", url, error)
+    return [], None
+
+
+def discover_attractions(geo_id, city='', base_url=BASE_URL, max_workers=4, page_size=PAGE_SIZE,
+                         max_pages=None, cache=None, rate_limiter=None, retry_policy=None, seen=None):
+    """
+    Yield the absolute URL of every attraction listed for geo_id, each once.
+    Pages are fetched max_workers at a time; every batch also covers all
+    pages the pagination has linked so far, and discovery stops once a
+    batch adds no new attraction (past the last page TripAdvisor repeats
+    page 1 or lists nothing).
+    seen: LocationIdSet to dedupe against, e.g. shared by several geos
+    max_pages: cap on listing pages fetched
+    """
+    seen = seen if seen is not None else LocationIdSet()
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+    fetch = partial(fetch_listing, geo_id=geo_id, cache=cache, rate_limiter=rate_limiter, retry_policy=retry_policy)
+
+    pages = 0
+    next_offset = 0
+    last_offset = 0
+    while max_pages is None or pages < max_pages:
+        batch_end = max(last_offset, next_offset + (max_workers - 1) * page_size)
+        offsets = list(range(next_offset, batch_end + 1, page_size))
+        if max_pages is not None:
+            offsets = offsets[:max_pages - pages]
+        urls = [listing_url(geo_id, offset, city, base_url) for offset in offsets]
+
+        new = 0
+        for _, url, (links, linked_offset) in run_concurrently(urls, fetch, max_workers,
+                                                               retry_policy=retry_policy,
+                                                               on_give_up=listing_failed):
+            pages += 1
+            METRICS.count('listing_pages')
+            last_offset = max(last_offset, linked_offset or 0)
+            for location_id, path in links:
+                if seen.add(location_id):
+                    new += 1
+                    yield urljoin(base_url, path)
+            log.debug("  🔎 %s: %d links, %d attractions so far", url, len(links), len(seen))
+
+        next_offset = offsets[-1] + page_size
+        if not new:
+            break
+
+    log.info("🔎 Discovered %d attractions for g%s on %d listing pages", len(seen), geo_id, pages)
+
+
+def stream_in_background(iterable, buffer_size=1000):
+    """
+    Run iterable on its own thread and yield its items through a bounded
+    queue, so discovery keeps fetching listing pages while the consumer is
+    busy; an exception in the producer is re-raised here
+    """
+    items = queue.Queue(maxsize=buffer_size)
+    done = object()
+    stop = threading.Event()
+    errors = []
+
+    def put(item):
+        # Give up once the consumer has gone away instead of blocking forever
+        while not stop.is_set():
+            try:
+                items.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except Exception as e:
+            errors.append(e)
+        finally:
+            put(done)
+
+    thread = threading.Thread(target=produce, name='discovery', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = items.get()
+            if item is done:
+                break
+            yield item
+    finally:
+        stop.set()
+    if errors:
+        raise errors[0]
+
+
+def iter_geo_attractions(geo_id, city='', base_url=BASE_URL, max_workers=4, requests_per_second=1/10,
+                         jitter=5, cache=None, retry_policy=None, max_pages=None, store=None, **options):
+    """
+    Discover a geo's attractions and scrape their durations in one pipeline:
+    URLs stream from discovery into scraper2.iter_attractions while further
+    listing pages are still being fetched. Both stages share one rate limit.
+    store: optional ResultsStore (URLs that already succeeded are skipped)
+    options: passed on to scraper2.iter_attractions
+    """
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+    rate_limiter = HostRateLimiter(requests_per_second, jitter=jitter)
+    urls = stream_in_background(discover_attractions(
+        geo_id, city, base_url, max_workers=max_workers, max_pages=max_pages, cache=cache,
+        rate_limiter=rate_limiter, retry_policy=retry_policy,
+    ))
+    return scraper2.iter_attractions(urls, max_workers=max_workers, cache=cache, retry_policy=retry_policy,
+                                     rate_limiter=rate_limiter, store=store, **options)
+
+
+# ===== MAIN =====
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    print("=" * 60)
+    print("🔎 TripAdvisor Discovery - Stockholm (g189852)")
+    print("=" * 60)
+
+    store = ResultsStore('stockholm_attractions.sqlite')
+    scraped = 0
+    for result in iter_geo_attractions(189852, 'Stockholm_Stockholm_County', max_pages=3, store=store):
+        scraped += 1
+        status = "✅" if result['success'] else "❌"
+        print(f"{scraped}. {status} {result['name']}: {result['duration']}")
+
+    scraper2.save_to_csv(store, filename='stockholm_attractions_duration.csv')
@@ -0,0 +1,78 @@
+"""
+Cached chromedriver resolution
+
+ChromeDriverManager().install() asks the network for the latest driver
+version on every call, which costs seconds per browser start and fails
+without a connection. The path it returns is resolved once here and kept
+in a small JSON file; later runs (and every browser the pool restarts)
+reuse it without touching the network. Offline mode never calls
+webdriver_manager: it takes $CHROMEDRIVER, the cached path or a
+chromedriver on the PATH, in that order.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'trailii', 'chromedriver.json')
+
+_lock = threading.Lock()
+_resolved = {}
+
+
+def _read_cached(cache_path):
+    try:
+        with open(cache_path, encoding='utf-8') as f:
+            path = json.load(f).get('path')
+    except (OSError, ValueError):
+        return None
+    return path if path and os.path.exists(path) else None
+
+
+def _write_cached(cache_path, path):
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'path': path, 'resolved_at': time.time()}, f)
+    os.replace(tmp_path, cache_path)
+
+
+def resolve_driver_path(offline=False, refresh=False, cache_path=DEFAULT_CACHE_PATH):
+    """
+    Path to a chromedriver binary, or None to let Selenium Manager find one
+    offline: never use the network, raise RuntimeError when nothing is cached
+    refresh: ask webdriver_manager again, e.g. after a Chrome update made the
+    cached driver incompatible
+    """
+    key = (offline, cache_path)
+    with _lock:
+        if not refresh and key in _resolved:
+            return _resolved[key]
+
+        path = os.environ.get('CHROMEDRIVER')
+        if not path and not refresh:
+            path = _read_cached(cache_path)
+        if not path and offline:
+            path = shutil.which('chromedriver')
+            if not path:
+                raise RuntimeError(f"No cached chromedriver in {cache_path} and none on the PATH; "
+                                   "run once without --offline or set $CHROMEDRIVER")
+        if not path:
+            try:
+                from webdriver_manager.chrome import ChromeDriverManager
+            except ImportError:
+                # Selenium 4.6+ resolves the driver itself
+                log.debug("webdriver_manager not installed, leaving the driver to Selenium Manager")
+                return None
+            start = time.perf_counter()
+            path = ChromeDriverManager().install()
+            log.info("🔧 Resolved chromedriver in %.1fs: %s", time.perf_counter() - start, path)
+            _write_cached(cache_path, path)
+
+        _resolved[key] = path
+        return path
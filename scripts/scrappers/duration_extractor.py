@@ -0,0 +1,468 @@
+"""
+Single-pass visit duration extractor
+
+Replaces the BeautifulSoup tree + repeated soup.find / find_all / get_text
+scans with one streaming html.parser.HTMLParser pass. Selector rules,
+keyword rules and the h1 lookup all run together while the document is
+parsed, and parsing stops as soon as both the name and a duration are known.
+"""
+
+import codecs
+import re
+from functools import partial
+from html.parser import HTMLParser
+
+from metrics import METRICS
+from structured_data import extract_structured
+
+
+# Same time pattern the scrapers already use
+TIME_PATTERN = re.compile(r'(\d+[-–]\d+|\d+)\s*(hour|hr|minute|min)s?', re.I)
+
+# Selenium method 3 patterns, in priority order, combined into one regex so
+# the full text is scanned once instead of once per pattern
+FULL_TEXT_PATTERNS = [
+    r'(\d+[-–]\d+)\s*(hour|hr)s?',
+    r'(\d+)\s*to\s*(\d+)\s*(hour|hr)s?',
+    r'about\s*(\d+)\s*(hour|hr)s?',
+    r'(\d+)\s*(hour|hr)s?',
+]
+_FULL_TEXT_RE = re.compile(
+    '|'.join(f'(?P<p{i}>{pattern})' for i, pattern in enumerate(FULL_TEXT_PATTERNS)),
+    re.I,
+)
+_FULL_TEXT_GROUPS = [re.compile(pattern, re.I) for pattern in FULL_TEXT_PATTERNS]
+
+VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+])
+RAW_TEXT_TAGS = frozenset(['script', 'style', 'noscript', 'template'])
+
+
+class SelectorRule:
+    """
+    Matches an element by attribute, like soup.find(tag, {attr: value})
+    value: exact match against the attribute or one of its class tokens
+    pattern: regex searched in the attribute or one of its class tokens
+    tags: element names to consider, None for any element
+    time_pattern: keep only the TIME_PATTERN match instead of the whole text
+    """
+
+    def __init__(self, rule_id, attr, value=None, pattern=None, tags=('div', 'span'), time_pattern=False):
+        self.rule_id = rule_id
+        self.attr = attr
+        self.value = value
+        self.pattern = re.compile(pattern, re.I) if isinstance(pattern, str) else pattern
+        self.tags = frozenset(tags) if tags is not None else None
+        self.time_pattern = time_pattern
+
+    def matches(self, tag, attrs):
+        if self.tags is not None and tag not in self.tags:
+            return False
+        attr_value = attrs.get(self.attr)
+        if attr_value is None:
+            return False
+        candidates = [attr_value] + (attr_value.split() if self.attr == 'class' else [])
+        if self.value is not None:
+            return self.value in candidates
+        return any(self.pattern.search(candidate) for candidate in candidates)
+
+    def resolve(self, text):
+        return _resolve(text, self.time_pattern)
+
+
+class KeywordRule:
+    """
+    Matches a text node containing keyword and reads its parent element,
+    like soup.find_all(text=re.compile(keyword)) + find_parent()
+    """
+
+    def __init__(self, rule_id, keyword, time_pattern=True):
+        self.rule_id = rule_id
+        self.keyword = keyword
+        self.pattern = re.compile(re.escape(keyword), re.I)
+        self.time_pattern = time_pattern
+
+    def resolve(self, text):
+        return _resolve(text, self.time_pattern)
+
+
+def _resolve(text, time_pattern):
+    if not time_pattern:
+        return text or None
+    time_match = TIME_PATTERN.search(text)
+    return time_match.group(0) if time_match else None
+
+
+# Rule sets used by the scrapers
+BASIC_RULES = [
+    SelectorRule('data-test-target', 'data-test-target', value='duration', tags=('div',)),
+    SelectorRule('class-duration', 'class', value='duration', tags=('div',)),
+    SelectorRule('class-contains-duration', 'class', pattern='duration', tags=('div',)),
+    KeywordRule('keyword-duration', 'Duration', time_pattern=False),
+]
+
+FULL_RULES = [
+    SelectorRule('data-test-target', 'data-test-target', value='duration'),
+    SelectorRule('class-duration', 'class', value='duration'),
+    SelectorRule('class-contains-duration', 'class', pattern='duration'),
+    SelectorRule('data-automation', 'data-automation', value='WebPresentation_PoiDuration'),
+    KeywordRule('keyword-suggested-duration', 'Suggested duration'),
+    KeywordRule('keyword-duration', 'Duration'),
+    KeywordRule('keyword-length-of-visit', 'length of visit'),
+]
+
+# Rendered pages: the selenium XPath patterns and keyword search, applied to
+# one page_source snapshot instead of live WebDriver queries, in the order
+# the old cascade tried them (XPath patterns first, then the keywords)
+RENDERED_RULES = [
+    KeywordRule('keyword-duration', 'Duration'),
+    KeywordRule('keyword-suggested-duration', 'Suggested duration'),
+    SelectorRule('class-contains-duration', 'class', pattern='duration', tags=None, time_pattern=True),
+    KeywordRule('keyword-hour', 'hour'),
+    KeywordRule('keyword-length-of-visit', 'length of visit'),
+]
+
+
+# Where a JSON-LD / application/json script or a window.__STATE__ blob starts
+_STRUCTURED_START_RE = re.compile(r'<script[^>]*application/(?:ld\+)?json|window\.__[A-Za-z0-9_]+__\s*=')
+_START_OVERLAP = 256
+
+
+class _StopParsing(Exception):
+    pass
+
+
+class DurationParser(HTMLParser):
+    """
+    Streaming parser that evaluates every rule in the same pass.
+    rules are in priority order: each rule keeps its first match in the
+    document and the highest-priority rule that matched wins, as if the
+    rules had been tried one after the other. Structured data
+    (use_structured) outranks every rule.
+    Feed it chunks; check .done to stop early (set once the h1 and the
+    top-priority rule have been found), then call result().
+    """
+
+    def __init__(self, rules=FULL_RULES, full_text_fallback=False):
+        super().__init__(convert_charrefs=True)
+        self._priority = {rule: i for i, rule in enumerate(rules)}
+        self.selector_rules = [rule for rule in rules if isinstance(rule, SelectorRule)]
+        self.keyword_rules = [rule for rule in rules if isinstance(rule, KeywordRule)]
+        # One combined scan tells whether a text node holds any keyword at all
+        self._keyword_re = None
+        if self.keyword_rules:
+            self._keyword_re = re.compile('|'.join(re.escape(rule.keyword) for rule in self.keyword_rules), re.I)
+        self.full_text_fallback = full_text_fallback
+
+        self.name = None
+        # Name from structured data, used when the page has no h1
+        self.fallback_name = None
+        self.duration = None
+        self.rule_id = None
+        self.done = False
+        # Priority of the rule that produced duration (-1: structured data)
+        self._best = None
+
+        # Each open element is [tag, first text chunk index, matched rules]
+        self._stack = []
+        self._chunks = []
+        self._raw_depth = 0
+        self._h1_start = None
+        # True while text events continue one text node (a node split across
+        # feed() calls arrives in pieces)
+        self._in_text = False
+
+    # --- HTMLParser callbacks ---
+
+    def handle_starttag(self, tag, attrs):
+        self._in_text = False
+        if tag in VOID_TAGS:
+            return
+        if tag in RAW_TEXT_TAGS:
+            self._raw_depth += 1
+
+        matched = None
+        if attrs and self._wanted(0):
+            attr_dict = dict(attrs)
+            for rule in self.selector_rules:
+                if not self._wanted(self._priority[rule]):
+                    break
+                if rule.matches(tag, attr_dict):
+                    matched = [rule]
+                    break
+
+        if tag == 'h1' and self.name is None and self._h1_start is None:
+            self._h1_start = len(self._stack)
+
+        self._stack.append([tag, len(self._chunks), matched])
+
+    def handle_startendtag(self, tag, attrs):
+        # Self-closing elements have no text to read
+        self._in_text = False
+
+    def handle_comment(self, data):
+        # Text on either side of a comment is two separate nodes
+        self._in_text = False
+
+    def handle_decl(self, decl):
+        self._in_text = False
+
+    def handle_pi(self, data):
+        self._in_text = False
+
+    def handle_endtag(self, tag):
+        self._in_text = False
+        if tag in VOID_TAGS:
+            return
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth][0] == tag:
+                break
+        else:
+            return
+        while len(self._stack) > depth:
+            self._close(len(self._stack) - 1)
+        if self.done:
+            raise _StopParsing()
+
+    def handle_data(self, data):
+        if self._raw_depth:
+            return
+        if self._in_text:
+            self._chunks[-1] += data
+        else:
+            self._chunks.append(data)
+            self._in_text = True
+        if self._keyword_re is None or not self._stack or not self._wanted(0):
+            return
+        text = self._chunks[-1]
+        if not self._keyword_re.search(text):
+            return
+        frame = self._stack[-1]
+        for rule in self.keyword_rules:
+            if not self._wanted(self._priority[rule]):
+                break
+            if rule.pattern.search(text):
+                if frame[2] is None:
+                    frame[2] = [rule]
+                elif rule not in frame[2]:
+                    frame[2].append(rule)
+
+    # --- internals ---
+
+    def _wanted(self, priority):
+        """
+        True when a match of the rule with this priority would still win
+        """
+        return self._best is None or priority < self._best
+
+    def _offer(self, priority, duration, rule_id):
+        if self._wanted(priority):
+            self.duration = duration
+            self.rule_id = rule_id
+            self._best = priority
+
+    @property
+    def structured_found(self):
+        return self._best == -1
+
+    def use_structured(self, duration, rule_id, name=None):
+        """
+        Take a duration found in structured data; it outranks every rule.
+        Its name only stands in for a missing h1: the object holding the
+        duration may be a tour or product rather than the attraction.
+        """
+        self._offer(-1, duration, rule_id)
+        self.fallback_name = self.fallback_name or name
+        self.done = self.name is not None
+
+    def _text_since(self, start):
+        return ''.join(chunk.strip() for chunk in self._chunks[start:])
+
+    def _close(self, depth):
+        tag, start, matched = self._stack.pop()
+        if tag in RAW_TEXT_TAGS and self._raw_depth:
+            self._raw_depth -= 1
+
+        if depth == self._h1_start:
+            self.name = self._text_since(start)
+            self._h1_start = None
+
+        if matched:
+            text = self._text_since(start)
+            for rule in sorted(matched, key=self._priority.get):
+                priority = self._priority[rule]
+                if not self._wanted(priority):
+                    break
+                duration = rule.resolve(text)
+                if duration:
+                    self._offer(priority, duration, rule.rule_id)
+                    break
+
+        # A lower-priority match could still be beaten further down the page
+        if self.name is not None and self._best is not None and self._best <= 0:
+            self.done = True
+
+    def feed(self, data):
+        if self.done:
+            return
+        try:
+            super().feed(data)
+        except _StopParsing:
+            pass
+
+    def close(self):
+        if not self.done:
+            try:
+                super().close()
+            except _StopParsing:
+                pass
+        if self.duration is None and self.full_text_fallback:
+            self.duration = search_full_text(''.join(self._chunks))
+            if self.duration:
+                self.rule_id = 'full-text'
+
+    def result(self, default_name='Unknown attraction'):
+        return {
+            'name': self.name or self.fallback_name or default_name,
+            'duration': self.duration,
+            'success': bool(self.duration),
+            'rule': self.rule_id,
+        }
+
+
+def search_full_text(text):
+    """
+    First match of the highest-priority FULL_TEXT_PATTERNS entry, in one scan
+    """
+    best_priority = None
+    best_text = None
+    for match in _FULL_TEXT_RE.finditer(text):
+        priority = int(match.lastgroup[1:])
+        if best_priority is None or priority < best_priority:
+            best_priority = priority
+            best_text = match.group(0)
+            if priority == 0:
+                break
+    if best_text is None:
+        return None
+    groups = _FULL_TEXT_GROUPS[best_priority].match(best_text).groups()
+    return ' '.join(groups)
+
+
+def extract_duration(html, rules=FULL_RULES, full_text_fallback=False,
+                     default_name='Unknown attraction', chunk_size=64 * 1024, structured=True):
+    """
+    Extract name and duration from a page in one pass
+    html: str or bytes (bytes are decoded as UTF-8)
+    structured: try JSON-LD / embedded page state first; when it has the
+    duration, the DOM pass only reads the h1 (the structured name is used
+    when the page has none)
+    Returns {'name', 'duration', 'success', 'rule'}; duration is None when
+    nothing was found
+    """
+    if isinstance(html, bytes):
+        with METRICS.timer('decode'):
+            html = html.decode('utf-8', errors='replace')
+
+    parser = DurationParser(rules, full_text_fallback)
+
+    if structured:
+        with METRICS.timer('extract'):
+            found = extract_structured(html)
+        if found['duration']:
+            # Duration known, only the h1 is still needed
+            parser.use_structured(found['duration'], found['rule'], found['name'])
+
+    with METRICS.timer('parse'):
+        for start in range(0, len(html), chunk_size):
+            parser.feed(html[start:start + chunk_size])
+            if parser.done:
+                break
+        parser.close()
+    return parser.result(default_name)
+
+
+def extract_from_chunks(chunks, rules=FULL_RULES, full_text_fallback=False,
+                        default_name='Unknown attraction', structured=True):
+    """
+    extract_duration over an iterable of byte chunks (e.g. a StreamingBody),
+    decoded incrementally. Stops pulling chunks as soon as the h1 and a
+    duration that nothing later can outrank (structured data or the
+    top-priority rule) are known, so the rest of the page is never
+    downloaded.
+    structured: JSON-LD / page-state blocks are decoded as soon as their
+    </script> arrives; only the text of a block still open is held
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    parser = DurationParser(rules, full_text_fallback)
+    # Text from the first structured block not decoded yet, or None
+    block = None
+    # End of the previous chunk, for a block start split across chunks
+    tail = ''
+
+    def try_structured(text):
+        with METRICS.timer('extract'):
+            found = extract_structured(text)
+        if found['duration'] and not parser.structured_found:
+            parser.use_structured(found['duration'], found['rule'], found['name'])
+
+    for chunk in chunks:
+        with METRICS.timer('decode'):
+            text = decoder.decode(chunk)
+        with METRICS.timer('parse'):
+            parser.feed(text)
+        if parser.done:
+            return parser.result(default_name)
+        if not structured or parser.structured_found:
+            continue
+
+        if block is None:
+            window = tail + text
+            start = _STRUCTURED_START_RE.search(window)
+            if start is None:
+                tail = window[-_START_OVERLAP:]
+                continue
+            block = window[start.start():]
+        else:
+            block += text
+        if '</script>' in text:
+            try_structured(block)
+            if parser.done:
+                return parser.result(default_name)
+            # Keep only a block that opened after the last one closed
+            rest = block[block.rfind('</script>') + len('</script>'):]
+            start = _STRUCTURED_START_RE.search(rest)
+            block = rest[start.start():] if start else None
+            tail = '' if start else rest[-_START_OVERLAP:]
+
+    with METRICS.timer('parse'):
+        parser.feed(decoder.decode(b'', final=True))
+        parser.close()
+    if structured and not parser.structured_found and block is not None:
+        try_structured(block)
+    return parser.result(default_name)
+
+
+def extract_structured_only(html, default_name='Unknown attraction'):
+    """
+    Structured-data engine on its own (no DOM fallback)
+    """
+    found = extract_structured(html)
+    return {'name': found['name'] or default_name, 'duration': found['duration'],
+            'success': bool(found['duration']), 'rule': found['rule']}
+
+
+# Registry of extraction engines, looked up by name
+EXTRACTORS = {
+    'stream': extract_duration,
+    'dom': partial(extract_duration, structured=False),
+    'structured': extract_structured_only,
+    # The individual stages of the DOM cascade, for benchmarking
+    'selectors': partial(extract_duration, rules=[rule for rule in FULL_RULES if isinstance(rule, SelectorRule)],
+                         structured=False),
+    'keywords': partial(extract_duration, rules=[rule for rule in FULL_RULES if isinstance(rule, KeywordRule)],
+                        structured=False),
+    'full-text': partial(extract_duration, rules=[], full_text_fallback=True, structured=False),
+}
@@ -0,0 +1,224 @@
+"""
+Visit duration index for the app
+
+Exports scraped durations as a small versioned JSON file that ships with
+the app bundle (src/constants/visitDurations.json), so the route optimizer
+can look up a visit duration without a network call:
+
+    {"format": 1, "version": 4, "generated_at": "...", "count": 2,
+     "ids": {"195439": [68, 60, 75]},
+     "names": {"radhuset town hall": "195439"}}
+
+ids maps a TripAdvisor d-id to [typical, min, max] minutes (max is null for
+"More than 3 hours"); names maps a normalised attraction name to its d-id.
+Both are plain objects, so lookups are O(1). Keys are sorted and there is
+no whitespace, so successive exports diff cleanly.
+
+Each export starts from the previous index: a new crawl adds and updates
+entries, and a failed scrape never removes a known duration. When anything
+changed the version goes up and a delta file with only the changed entries
+is written to duration_deltas/, for clients that already have the previous
+version.
+Usage: python3 duration_index.py stockholm_attractions.sqlite [--output ...]
+"""
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import unicodedata
+from datetime import datetime, timezone
+
+from duration_normalizer import normalize_result
+from results_store import ResultsStore
+from tripadvisor_urls import parse_attraction_url
+
+FORMAT = 1
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_OUTPUT = os.path.join(HERE, '..', '..', 'src', 'constants', 'visitDurations.json')
+DEFAULT_DELTA_DIR = os.path.join(HERE, 'duration_deltas')
+
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+# The combining diacritics block, the same range visitDurations.js strips
+_COMBINING_RE = re.compile('[\u0300-\u036f]')
+# Letters NFKD leaves alone
+_FOLD = str.maketrans({'ø': 'o', 'æ': 'ae', 'œ': 'oe', 'ß': 'ss', 'đ': 'd', 'ł': 'l', 'þ': 'th'})
+
+
+def normalize_name(name):
+    """
+    Lowercase ASCII words: "Rådhuset (Town Hall)" -> "radhuset town hall",
+    "Søndermarken" -> "sondermarken".
+    src/utils/visitDurations.js normalises the same way.
+    """
+    folded = _COMBINING_RE.sub('', unicodedata.normalize('NFKD', name or ''))
+    return _NON_WORD_RE.sub(' ', folded.lower().translate(_FOLD)).strip()
+
+
+def read_results(path):
+    """
+    Result dicts from a ResultsStore (.sqlite), CSV or JSONL file
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.sqlite', '.db'):
+        store = ResultsStore(path)
+        try:
+            yield from store.rows()
+        finally:
+            store.close()
+    elif extension == '.jsonl':
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif extension == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.DictReader(f)
+    else:
+        raise ValueError(f"Cannot read results from '{extension}' files")
+
+
+def empty_index():
+    return {'format': FORMAT, 'version': 0, 'generated_at': None, 'count': 0, 'ids': {}, 'names': {}}
+
+
+def load_index(path):
+    if not os.path.exists(path):
+        return empty_index()
+    with open(path, encoding='utf-8') as f:
+        index = json.load(f)
+    if index.get('format') != FORMAT:
+        raise ValueError(f"{path}: unsupported index format {index.get('format')}")
+    return index
+
+
+def _dump(data, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        f.write('\n')
+
+
+def build_index(results, previous=None):
+    """
+    New index: previous (or empty) updated with every result that
+    normalises to a duration. The version only goes up when an entry changed.
+    """
+    previous = previous or empty_index()
+    ids = dict(previous['ids'])
+    names = dict(previous['names'])
+
+    for result in results:
+        parsed = parse_attraction_url(result.get('url') or '')
+        normalized = normalize_result(result)
+        if parsed is None or normalized['duration_status'] != 'ok':
+            continue
+        location_id = str(parsed[1])
+        ids[location_id] = [normalized['typical_minutes'], normalized['min_minutes'], normalized['max_minutes']]
+        name = normalize_name(result.get('name'))
+        if name:
+            names[name] = location_id
+
+    changed = ids != previous['ids'] or names != previous['names']
+    return {
+        'format': FORMAT,
+        'version': previous['version'] + 1 if changed else previous['version'],
+        'generated_at': (datetime.now(timezone.utc).isoformat(timespec='seconds')
+                         if changed else previous['generated_at']),
+        'count': len(ids),
+        'ids': ids,
+        'names': names,
+    }
+
+
+def _changes(old, new):
+    changed = {key: value for key, value in new.items() if old.get(key) != value}
+    removed = sorted(key for key in old if key not in new)
+    return changed, removed
+
+
+def diff_index(old, new):
+    """
+    Delta taking a client from old['version'] to new['version']
+    """
+    ids, removed_ids = _changes(old['ids'], new['ids'])
+    names, removed_names = _changes(old['names'], new['names'])
+    return {
+        'format': FORMAT,
+        'base_version': old['version'],
+        'version': new['version'],
+        'generated_at': new['generated_at'],
+        'ids': ids,
+        'names': names,
+        'removed_ids': removed_ids,
+        'removed_names': removed_names,
+    }
+
+
+def apply_delta(index, delta):
+    """
+    Index updated by delta; the delta must start from the index's version
+    """
+    if delta['base_version'] != index['version']:
+        raise ValueError(f"Delta applies to version {delta['base_version']}, index is at {index['version']}")
+    ids = {**index['ids'], **delta['ids']}
+    names = {**index['names'], **delta['names']}
+    for key in delta['removed_ids']:
+        ids.pop(key, None)
+    for key in delta['removed_names']:
+        names.pop(key, None)
+    return {
+        'format': FORMAT,
+        'version': delta['version'],
+        'generated_at': delta['generated_at'],
+        'count': len(ids),
+        'ids': ids,
+        'names': names,
+    }
+
+
+def lookup(index, name=None, location_id=None):
+    """
+    [typical, min, max] minutes for a d-id or attraction name, or None
+    """
+    if location_id is not None and str(location_id) in index['ids']:
+        return index['ids'][str(location_id)]
+    location_id = index['names'].get(normalize_name(name)) if name else None
+    return index['ids'].get(location_id) if location_id else None
+
+
+def export_index(results_path, output=DEFAULT_OUTPUT, delta_dir=DEFAULT_DELTA_DIR):
+    """
+    Update the index at output from a results file, write a delta when the
+    version changed. Returns (index, delta path or None).
+    """
+    previous = load_index(output)
+    index = build_index(read_results(results_path), previous)
+    if index['version'] == previous['version']:
+        return index, None
+
+    _dump(index, output)
+    delta_path = None
+    if previous['version']:
+        os.makedirs(delta_dir, exist_ok=True)
+        delta_path = os.path.join(delta_dir, f"visitDurations.delta-{previous['version']}-{index['version']}.json")
+        _dump(diff_index(previous, index), delta_path)
+    return index, delta_path
+
+
+# ===== MAIN =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export scraped visit durations for the app')
+    parser.add_argument('results', help='ResultsStore .sqlite, .csv or .jsonl results')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='index JSON to create or update')
+    parser.add_argument('--delta-dir', default=DEFAULT_DELTA_DIR, help='where delta files are written')
+    args = parser.parse_args()
+
+    index, delta_path = export_index(args.results, args.output, args.delta_dir)
+    if not index['count']:
+        print("❌ No durations to export")
+        sys.exit(1)
+    print(f"💾 Index version {index['version']}: {index['count']} attractions -> {os.path.normpath(args.output)}")
+    if delta_path:
+        print(f"   Delta: {delta_path}")
@@ -0,0 +1,195 @@
+"""
+Visit duration normaliser
+
+Turns the scraped duration text ("60–75 minutes", "1-2 hours", "about 2
+hours", "More than 3 hours", "1 hour 30 minutes") into numbers the app can
+schedule with: min_minutes, max_minutes, typical_minutes and a confidence
+between 0 and 1. Error and placeholder text that the scrapers write into
+the same column ("HTTP Error: ...", "No visit duration data found") is
+reported through duration_status instead of being parsed.
+
+The grammar is a handful of regexes compiled once at import, and results
+are memoised per distinct text, so normalising a results file is a
+single streaming pass.
+Usage: python3 duration_normalizer.py stockholm_attractions_duration.csv [output.csv]
+       (.jsonl result files work the same way)
+"""
+
+import csv
+import json
+import os
+import re
+import sys
+from collections import Counter
+from functools import lru_cache
+
+NORMALIZED_FIELDS = ['min_minutes', 'max_minutes', 'typical_minutes', 'confidence', 'duration_status']
+
+# Number: 1, 1.5, 1,5 or a whole word ("a" in "am" is not a number)
+_NUMBER = r'(\d+(?:[.,]\d+)?|\b(?:half an?|an?|one|two|three|four|five|six)\b)'
+# A bare "m" only straight after a digit ("30m"), never "9 am" / "5 pm"
+_UNIT = r'(hours?|hrs?|h|minutes?|mins?|(?<=\d)m)\b'
+# "to" between two numbers; search_full_text joins "2 to 3 hours" as "2 3 hour"
+_DASH = r'(?:-|–|—|to|until|(?<=\d)\s+(?=\d))'
+
+_RANGE_RE = re.compile(rf'{_NUMBER}\s*(?:{_UNIT})?\s*{_DASH}\s*{_NUMBER}\s*{_UNIT}')
+_AMOUNT_RE = re.compile(rf'{_NUMBER}\s*\+?\s*{_UNIT}')
+_APPROX_RE = re.compile(r'\b(?:about|around|approx(?:imately|\.)?|roughly|circa|ca\.?)\b|~')
+_AT_LEAST_RE = re.compile(r'\b(?:more than|over|at least|minimum(?: of)?)\b|>|\+')
+_AT_MOST_RE = re.compile(r'\b(?:less than|under|up to|within|max(?:imum)?(?: of)?)\b|<')
+_DAY_RE = re.compile(r'\b(half|full|whole|all)[ -]?day\b')
+
+# Scraper placeholders and errors: (pattern, status)
+_STATUS_RES = [
+    (re.compile(r'^no (?:visit )?duration', re.I), 'not_found'),
+    (re.compile(r'^(?:http error|request failed|failed request|parse failed|error)\b', re.I), 'error'),
+]
+
+_WORDS = {'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+          'half a': 0.5, 'half an': 0.5}
+_DAY_MINUTES = {'half': 240, 'full': 480, 'whole': 480, 'all': 480}
+
+CONFIDENCE = {
+    'exact': 1.0,
+    'range': 0.9,
+    'approx': 0.8,
+    'open': 0.6,
+    'day': 0.5,
+}
+
+
+def _number(text):
+    text = text.strip()
+    if text in _WORDS:
+        return _WORDS[text]
+    return float(text.replace(',', '.'))
+
+
+def _minutes(number, unit):
+    return _number(number) * (60 if unit.startswith('h') else 1)
+
+
+def _round5(minutes):
+    return int(5 * round(minutes / 5))
+
+
+def _result(low, high, typical, confidence, status='ok'):
+    return {
+        'min_minutes': None if low is None else int(round(low)),
+        'max_minutes': None if high is None else int(round(high)),
+        'typical_minutes': None if typical is None else int(round(typical)),
+        'confidence': confidence,
+        'duration_status': status,
+    }
+
+
+def _failure(status):
+    return _result(None, None, None, 0.0, status)
+
+
+@lru_cache(maxsize=4096)
+def normalize_duration(text):
+    """
+    Parse one duration text, returns a dict with NORMALIZED_FIELDS.
+    duration_status is 'ok', 'empty', 'not_found', 'error' or 'unparsed'.
+    """
+    if text is None or not str(text).strip():
+        return _failure('empty')
+    text = str(text).strip()
+    for pattern, status in _STATUS_RES:
+        if pattern.search(text):
+            return _failure(status)
+
+    lowered = text.lower()
+
+    day = _DAY_RE.search(lowered)
+    if day:
+        minutes = _DAY_MINUTES[day.group(1)]
+        return _result(minutes, minutes, minutes, CONFIDENCE['day'])
+
+    match = _RANGE_RE.search(lowered)
+    if match:
+        low_number, low_unit, high_number, high_unit = match.groups()
+        low = _minutes(low_number, low_unit or high_unit)
+        high = _minutes(high_number, high_unit)
+        if low > high:
+            low, high = high, low
+        return _result(low, high, (low + high) / 2, CONFIDENCE['range'])
+
+    amounts = _AMOUNT_RE.findall(lowered)
+    if not amounts:
+        return _failure('unparsed')
+    # "1 hour 30 minutes" / "1h 30m": the parts add up
+    minutes = sum(_minutes(number, unit) for number, unit in amounts)
+
+    if _AT_LEAST_RE.search(lowered):
+        return _result(minutes, None, _round5(minutes * 1.25), CONFIDENCE['open'])
+    if _AT_MOST_RE.search(lowered):
+        return _result(0, minutes, _round5(minutes * 0.75), CONFIDENCE['open'])
+    if _APPROX_RE.search(lowered):
+        return _result(minutes, minutes, minutes, CONFIDENCE['approx'])
+    return _result(minutes, minutes, minutes, CONFIDENCE['exact'])
+
+
+def normalize_result(result):
+    """
+    A result dict with the NORMALIZED_FIELDS added; a failed scrape is
+    never parsed, whatever its duration text says
+    """
+    if not result.get('success', True) or str(result.get('success')).lower() == 'false':
+        text = result.get('duration')
+        normalized = normalize_duration(text)
+        if normalized['duration_status'] == 'ok':
+            normalized = _failure('error')
+    else:
+        normalized = normalize_duration(result.get('duration'))
+    return {**result, **normalized}
+
+
+def _normalize_jsonl(input_path, output_path, statuses):
+    with open(input_path, encoding='utf-8') as source, open(output_path, 'w', encoding='utf-8') as target:
+        for line in source:
+            if not line.strip():
+                continue
+            normalized = normalize_result(json.loads(line))
+            statuses[normalized['duration_status']] += 1
+            target.write(json.dumps(normalized, ensure_ascii=False) + '\n')
+    return statuses
+
+
+def normalize_file(input_path, output_path):
+    """
+    Stream a results CSV (or .jsonl) into a copy with the NORMALIZED_FIELDS
+    columns. Returns a Counter of duration_status values.
+    """
+    statuses = Counter()
+    if os.path.splitext(input_path)[1] == '.jsonl':
+        return _normalize_jsonl(input_path, output_path, statuses)
+    with open(input_path, newline='', encoding='utf-8-sig') as source, \
+            open(output_path, 'w', newline='', encoding='utf-8-sig') as target:
+        reader = csv.DictReader(source)
+        fieldnames = list(reader.fieldnames or []) + [
+            field for field in NORMALIZED_FIELDS if field not in (reader.fieldnames or [])
+        ]
+        writer = csv.DictWriter(target, fieldnames=fieldnames)
+        writer.writeheader()
+        for row in reader:
+            normalized = normalize_result(row)
+            statuses[normalized['duration_status']] += 1
+            writer.writerow(normalized)
+    return statuses
+
+
+# ===== MAIN =====
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    input_path = sys.argv[1]
+    stem, extension = os.path.splitext(input_path)
+    output_path = sys.argv[2] if len(sys.argv) > 2 else f"{stem}_normalized{extension}"
+
+    statuses = normalize_file(input_path, output_path)
+    print(f"💾 Normalised {sum(statuses.values())} rows into: {output_path}")
+    for status, count in statuses.most_common():
+        print(f"   {status}: {count}")
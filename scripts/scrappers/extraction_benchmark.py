@@ -0,0 +1,251 @@
+"""
+Offline benchmark for the duration extractors
+
+Runs every engine in duration_extractor.EXTRACTORS over a corpus of pages:
+the captured selenium_debug.html, synthetic pages from 64 KB up to several
+megabytes with the duration hidden in different places, and optionally a
+directory of extra captures. For each engine it reports pages/sec,
+per-page p50/p99 latency, peak memory (tracemalloc) and how many pages gave
+the expected duration. Nothing touches the network.
+
+Results can be saved as a baseline and later runs compared against it;
+a slower engine (beyond the tolerance) or a lower hit count is reported as
+a regression and the script exits with status 1.
+Usage:
+    python3 extraction_benchmark.py --save-baseline
+    python3 extraction_benchmark.py --baseline extraction_baseline.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from duration_extractor import EXTRACTORS
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEBUG_PAGE = os.path.join(HERE, 'selenium_debug.html')
+DEFAULT_BASELINE = os.path.join(HERE, 'extraction_baseline.json')
+
+# Where the synthetic page hides its duration, and what the engines that
+# understand that form should return for it
+SYNTHETIC_KINDS = {
+    'selector': ('<div class="poi-info"><div data-test-target="duration">2-3 hours</div></div>', '2-3 hours'),
+    'keyword': ('<div class="poi-info">Suggested duration: 1-2 hours</div>', '1-2 hours'),
+    'json-ld': ('<script type="application/ld+json">{"@context": "https://schema.org", '
+                '"@type": "TouristAttraction", "name": "Synthetic Attraction", '
+                '"timeRequired": "PT1H30M"}</script>', '1 hour 30 minutes'),
+    'full-text': ('<p>Plan 2-3 hours for the whole exhibition.</p>', '2-3 hour'),
+}
+SYNTHETIC_SIZES = (64 * 1024, 512 * 1024, 2 * 1024 * 1024)
+
+# One review card of filler markup: no times, no duration keywords
+FILLER_BLOCK = (
+    '<div class="review-card" data-review-id="{n}">'
+    '<div class="review-header"><span class="reviewer">Traveller {n}</span>'
+    '<span class="rating bubble_50"></span></div>'
+    '<div class="review-body"><p>Beautiful building with a long history, the guide was '
+    'friendly and the view over the water was worth the trip. Recommended for families '
+    'and anyone interested in architecture.</p></div>'
+    '<script>window.trackImpression && window.trackImpression({n});</script>'
+    '</div>\n'
+)
+
+
+def synthetic_page(kind, size):
+    """
+    An attraction page of roughly size bytes with the duration near the end,
+    so engines that cannot stop early have to read all of it
+    """
+    snippet, _ = SYNTHETIC_KINDS[kind]
+    head = f'<html><head><title>Synthetic {kind}</title></head><body><h1>Synthetic Attraction</h1>\n'
+    parts = [head]
+    length = len(head)
+    n = 0
+    while length < size:
+        block = FILLER_BLOCK.format(n=n)
+        parts.append(block)
+        length += len(block)
+        n += 1
+    parts.append(snippet)
+    parts.append('</body></html>')
+    return ''.join(parts).encode('utf-8')
+
+
+def build_corpus(corpus_dir=None):
+    """
+    List of (page_id, html bytes, expected duration or None)
+    corpus_dir: extra .html files; expected durations are read from an
+    optional expected.json ({"file.html": "1-2 hours"}) in the same directory
+    """
+    corpus = []
+    if os.path.exists(DEBUG_PAGE):
+        with open(DEBUG_PAGE, 'rb') as f:
+            corpus.append(('selenium_debug.html', f.read(), '60–75 minutes'))
+
+    for kind, (_, expected) in SYNTHETIC_KINDS.items():
+        for size in SYNTHETIC_SIZES:
+            corpus.append((f'synthetic-{kind}-{size // 1024}k', synthetic_page(kind, size), expected))
+
+    if corpus_dir:
+        expected_path = os.path.join(corpus_dir, 'expected.json')
+        expected = {}
+        if os.path.exists(expected_path):
+            with open(expected_path, encoding='utf-8') as f:
+                expected = json.load(f)
+        for name in sorted(os.listdir(corpus_dir)):
+            if name.endswith(('.html', '.htm')):
+                with open(os.path.join(corpus_dir, name), 'rb') as f:
+                    corpus.append((name, f.read(), expected.get(name)))
+    return corpus
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def bench_engine(extract, corpus, repeat=3, memory=True):
+    """
+    Time extract over the corpus repeat times, then measure its peak memory
+    in a separate tracemalloc pass. Tracing slows parsing down several
+    times over, so that pass only covers the largest page of each kind
+    (memory=False skips it).
+    """
+    latencies = []
+    hits = 0
+    misses = []
+    total_bytes = 0
+
+    start = time.perf_counter()
+    for round_number in range(repeat):
+        for page_id, html, expected in corpus:
+            page_start = time.perf_counter()
+            result = extract(html)
+            latencies.append(time.perf_counter() - page_start)
+            if round_number == 0:
+                total_bytes += len(html)
+                if expected is not None:
+                    if result['duration'] == expected:
+                        hits += 1
+                    else:
+                        misses.append(page_id)
+    elapsed = time.perf_counter() - start
+
+    largest = {}
+    for page_id, html, _ in corpus:
+        kind = page_id.rsplit('-', 1)[0]
+        if len(html) > len(largest.get(kind, b'')):
+            largest[kind] = html
+
+    peak = 0
+    if memory:
+        tracemalloc.start()
+        try:
+            for html in largest.values():
+                tracemalloc.reset_peak()
+                extract(html)
+                peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+
+    latencies.sort()
+    pages = len(latencies)
+    return {
+        'pages': pages,
+        'pages_per_second': round(pages / elapsed, 2) if elapsed else 0.0,
+        'mb_per_second': round(total_bytes * repeat / elapsed / (1024 * 1024), 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'peak_memory_mb': round(peak / (1024 * 1024), 2),
+        'hits': hits,
+        'checked': sum(1 for _, _, expected in corpus if expected is not None),
+        'misses': misses,
+    }
+
+
+def run_benchmark(engines=None, repeat=3, corpus_dir=None, memory=True):
+    corpus = build_corpus(corpus_dir)
+    engines = engines or list(EXTRACTORS)
+    return {name: bench_engine(EXTRACTORS[name], corpus, repeat, memory) for name in engines}
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    Regression messages: throughput below (1 - tolerance) of the baseline,
+    or fewer expected durations found
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        floor = previous['pages_per_second'] * (1 - tolerance)
+        if current['pages_per_second'] < floor:
+            regressions.append(f"{name}: {current['pages_per_second']} pages/s, "
+                               f"baseline {previous['pages_per_second']}")
+        if current['hits'] < previous['hits']:
+            regressions.append(f"{name}: {current['hits']} expected durations found, "
+                               f"baseline {previous['hits']} (misses: {', '.join(current['misses'])})")
+    return regressions
+
+
+def print_report(results, baseline=None):
+    print(f"\n{'engine':<12} {'pages/s':>9} {'MB/s':>8} {'p50 ms':>9} {'p99 ms':>9} {'peak MB':>8} {'found':>7}")
+    print('-' * 68)
+    for name, r in results.items():
+        line = (f"{name:<12} {r['pages_per_second']:>9} {r['mb_per_second']:>8} {r['p50_ms']:>9} "
+                f"{r['p99_ms']:>9} {r['peak_memory_mb']:>8} {r['hits']:>3}/{r['checked']:<3}")
+        previous = (baseline or {}).get(name)
+        if previous and previous['pages_per_second']:
+            change = r['pages_per_second'] / previous['pages_per_second'] - 1
+            line += f"  ({change:+.0%} vs baseline)"
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Offline benchmark for the duration extractors')
+    parser.add_argument('--engine', action='append', choices=sorted(EXTRACTORS),
+                        help='engine to run (repeatable, default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='passes over the corpus')
+    parser.add_argument('--corpus', help='directory of extra captured .html pages')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='baseline JSON to compare against')
+    parser.add_argument('--save-baseline', action='store_true', help='write the results as the new baseline')
+    parser.add_argument('--skip-memory', action='store_true', help='skip the (slow) tracemalloc pass')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed throughput drop before reporting a regression')
+    args = parser.parse_args(argv)
+
+    print("⏱️  Benchmarking extractors (offline)...")
+    results = run_benchmark(args.engine, args.repeat, args.corpus, not args.skip_memory)
+
+    baseline = None
+    if not args.save_baseline and os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Baseline saved to: {args.baseline}")
+        return 0
+
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\n❌ Regressions against the baseline:")
+        for message in regressions:
+            print(f"   - {message}")
+        return 1
+    print("\n✅ No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
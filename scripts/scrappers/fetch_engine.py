@@ -0,0 +1,189 @@
+"""
+Concurrent fetch engine shared by the scrapers.
+
+Keeps up to N scrape calls in flight on a thread pool while a per-host
+token bucket keeps the overall request rate inside the same budget the
+old fixed sleeps gave us. Network latency and parsing of different pages
+overlap instead of the crawl sitting idle between requests.
+"""
+
+import heapq
+import logging
+import threading
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+
+from metrics import METRICS
+from retry_policy import RetryableError
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket
+    rate: tokens added per second
+    burst: maximum tokens that can be saved up
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        Block until a token is available, return the seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class HostRateLimiter:
+    """
+    One token bucket per host, created on first use
+    jitter: extra random delay (seconds) added after each token so the
+    request pattern doesn't look perfectly periodic
+    """
+
+    def __init__(self, requests_per_second, burst=1, jitter=0.0):
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.jitter = jitter
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, host):
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.requests_per_second, self.burst)
+                self._buckets[host] = bucket
+            return bucket
+
+    def wait(self, url):
+        """
+        Block until a request to this URL's host is allowed
+        """
+        waited = self._bucket(urlsplit(url).netloc).acquire()
+        if self.jitter:
+            extra = random.uniform(0, self.jitter)
+            time.sleep(extra)
+            waited += extra
+        METRICS.observe('rate_limit_wait', waited)
+        return waited
+
+
+def run_concurrently(urls, scrape_fn, max_workers=4, rate_limiter=None,
+                     retry_policy=None, on_give_up=None):
+    """
+    Run scrape_fn(url) over urls with up to max_workers calls in flight.
+    Yields (index, url, result) in completion order. Only a bounded window
+    of URLs is submitted at a time, so urls can be any (lazy) iterable.
+
+    retry_policy: when scrape_fn raises RetryableError the URL goes on a
+    delay queue and is resubmitted once its backoff has passed, while other
+    URLs keep flowing. on_give_up(url, error) builds the result for a URL
+    the policy stops retrying.
+    """
+    def task(url):
+        if rate_limiter is not None:
+            rate_limiter.wait(url)
+        return scrape_fn(url)
+
+    url_iter = enumerate(urls)
+    window = max_workers * 2
+    pending = {}
+    delayed = []  # heap of (ready_at, index, url, attempt)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit(index, url, attempt):
+            pending[executor.submit(task, url)] = (index, url, attempt)
+
+        def fill():
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now and len(pending) < window:
+                _, index, url, attempt = heapq.heappop(delayed)
+                submit(index, url, attempt)
+            while len(pending) < window:
+                item = next(url_iter, None)
+                if item is None:
+                    break
+                submit(item[0], item[1], 1)
+
+        fill()
+        while pending or delayed:
+            timeout = None
+            if delayed:
+                timeout = max(0.0, delayed[0][0] - time.monotonic())
+            if not pending:
+                time.sleep(timeout)
+                fill()
+                continue
+
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                index, url, attempt = pending.pop(future)
+                try:
+                    result = future.result()
+                except RetryableError as error:
+                    delay = retry_policy.next_delay(error, attempt) if retry_policy else None
+                    METRICS.count('retries', status=error.status or 'network',
+                                  outcome='scheduled' if delay is not None else 'gave_up')
+                    if delay is not None:
+                        log.debug("  ⏳ %s - retry %d in %.1fs", error, attempt, delay)
+                        heapq.heappush(delayed, (time.monotonic() + delay, index, url, attempt + 1))
+                        continue
+                    if on_give_up is None:
+                        raise
+                    result = on_give_up(url, error)
+                yield index, url, result
+            fill()
+
+
+def in_order(indexed_results, on_result=None):
+    """
+    Turn (index, url, result) tuples arriving in any order back into results
+    in index order. Finished results are held back only until the earlier
+    ones arrive.
+    on_result: called with every result as soon as it arrives, before it is
+    reordered, so a URL waiting out a retry delay does not hold back
+    recording the ones that finished after it
+    """
+    next_index = 0
+    held = {}
+    for index, url, result in indexed_results:
+        if on_result is not None:
+            on_result(result)
+        held[index] = result
+        while next_index in held:
+            yield held.pop(next_index)
+            next_index += 1
+
+
+def scrape_in_order(urls, scrape_fn, max_workers=4, rate_limiter=None,
+                    retry_policy=None, on_give_up=None, on_result=None):
+    """
+    Like run_concurrently but yields results in the same order as urls
+    on_result: see in_order
+    """
+    return in_order(run_concurrently(urls, scrape_fn, max_workers, rate_limiter,
+                                     retry_policy, on_give_up), on_result)
@@ -0,0 +1,352 @@
+"""
+Persistent on-disk HTTP response cache
+
+Bodies are stored content-addressed by the SHA-256 of the URL, with a small
+SQLite index holding status, ETag / Last-Modified and access times.
+Fresh entries are served without touching the network, stale entries are
+revalidated with a conditional GET (a 304 only refreshes the timestamp),
+and the least recently used bodies are evicted once the cache grows past
+max_bytes.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from metrics import METRICS
+
+
+class CachedResponse:
+    """
+    Minimal stand-in for requests.Response built from a cache entry
+    """
+
+    def __init__(self, url, status_code, content, headers, from_cache=True):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = from_cache
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def iter_content(self, chunk_size=1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        pass
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            import requests
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error (cached) for url: {self.url}", response=self
+            )
+
+
+class HttpCache:
+    """
+    directory: where bodies and the index live
+    ttl: seconds an entry is served without revalidation
+    max_bytes: total body size kept on disk before LRU eviction
+    offline: serve any cached entry regardless of age, so re-running
+    extraction after a selector fix costs no network round trips
+    """
+
+    def __init__(self, directory='.http_cache', ttl=24 * 3600, max_bytes=500 * 1024 * 1024, offline=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.offline = offline
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                content_type TEXT,
+                size INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._db.commit()
+
+    @staticmethod
+    def key_for(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _body_path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.body')
+
+    def get(self, url):
+        """
+        Return the cache entry for url as a dict (with 'body'), or None
+        """
+        key = self.key_for(url)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT status, etag, last_modified, content_type, fetched_at FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+
+        try:
+            with open(self._body_path(key), 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            self.delete(url)
+            return None
+
+        status, etag, last_modified, content_type, fetched_at = row
+        return {
+            'url': url,
+            'status': status,
+            'etag': etag,
+            'last_modified': last_modified,
+            'content_type': content_type,
+            'fetched_at': fetched_at,
+            'body': body,
+        }
+
+    def is_fresh(self, entry):
+        return self.offline or time.time() - entry['fetched_at'] < self.ttl
+
+    def put(self, url, status, body, headers=None):
+        """
+        Store a response body and its validators
+        """
+        headers = headers or {}
+        key = self.key_for(url)
+        path = self._body_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT OR REPLACE INTO entries
+                    (key, url, status, etag, last_modified, content_type, size, fetched_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, url, status, headers.get('ETag'), headers.get('Last-Modified'),
+                 headers.get('Content-Type'), len(body), now, now),
+            )
+            self._db.commit()
+        self._evict()
+
+    def revalidated(self, url, headers=None):
+        """
+        Mark an entry fresh again after a 304, picking up any new validators
+        """
+        headers = headers or {}
+        with self._lock:
+            self._db.execute(
+                """
+                UPDATE entries SET fetched_at = ?,
+                    etag = COALESCE(?, etag),
+                    last_modified = COALESCE(?, last_modified)
+                WHERE key = ?
+                """,
+                (time.time(), headers.get('ETag'), headers.get('Last-Modified'), self.key_for(url)),
+            )
+            self._db.commit()
+
+    def delete(self, url):
+        key = self.key_for(url)
+        with self._lock:
+            self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._db.commit()
+        try:
+            os.remove(self._body_path(key))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """
+        Drop least recently used entries until the cache fits in max_bytes
+        """
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            victims = []
+            for key, size in self._db.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+                if total <= self.max_bytes:
+                    break
+                victims.append(key)
+                total -= size
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(k,) for k in victims])
+            self._db.commit()
+        for key in victims:
+            try:
+                os.remove(self._body_path(key))
+            except FileNotFoundError:
+                pass
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def conditional_headers(entry):
+    """
+    If-None-Match / If-Modified-Since headers for revalidating an entry
+    """
+    headers = {}
+    if entry.get('etag'):
+        headers['If-None-Match'] = entry['etag']
+    if entry.get('last_modified'):
+        headers['If-Modified-Since'] = entry['last_modified']
+    return headers
+
+
+def _timed_get(session, url, headers, timeout, stream=False):
+    """
+    session.get timed as the 'fetch' stage, split into 'connect' (DNS,
+    connect and waiting for the headers, from response.elapsed) and
+    'download' (reading the body), plus a status counter.
+    With stream=True only the headers have arrived when this returns;
+    StreamingBody times the download.
+    """
+    start = time.perf_counter()
+    try:
+        if stream:
+            response = session.get(url, headers=headers, timeout=timeout, stream=True)
+        else:
+            response = session.get(url, headers=headers, timeout=timeout)
+    except Exception as e:
+        METRICS.count('http_responses', status=type(e).__name__, source='network')
+        raise
+    total = time.perf_counter() - start
+    METRICS.observe('fetch', total)
+    elapsed = getattr(response, 'elapsed', None)
+    if elapsed is not None:
+        connect = min(elapsed.total_seconds(), total)
+        METRICS.observe('connect', connect)
+        if not stream:
+            METRICS.observe('download', total - connect)
+    METRICS.count('http_responses', status=response.status_code, source='network')
+    return response
+
+
+def cached_get(session, url, cache=None, headers=None, timeout=10, rate_limiter=None, stream=False):
+    """
+    session.get(url) through the cache
+    rate_limiter: only consulted when the network is actually used
+    stream: leave a network body unread for StreamingBody; it is then not
+    cached here (StreamingBody stores it once it has been read in full)
+    """
+    if cache is None:
+        if rate_limiter is not None:
+            rate_limiter.wait(url)
+        return _timed_get(session, url, headers, timeout, stream)
+
+    entry = cache.get(url)
+    if entry is not None and cache.is_fresh(entry):
+        METRICS.count('http_responses', status=entry['status'], source='cache')
+        return CachedResponse(url, entry['status'], entry['body'], {'Content-Type': entry['content_type']})
+
+    request_headers = dict(headers or {})
+    if entry is not None:
+        request_headers.update(conditional_headers(entry))
+
+    if rate_limiter is not None:
+        rate_limiter.wait(url)
+    response = _timed_get(session, url, request_headers, timeout, stream)
+
+    if response.status_code == 304 and entry is not None:
+        cache.revalidated(url, response.headers)
+        return CachedResponse(url, entry['status'], entry['body'], {'Content-Type': entry['content_type']})
+
+    if response.status_code == 200 and not stream:
+        cache.put(url, response.status_code, response.content, response.headers)
+    response.from_cache = False
+    return response
+
+
+class StreamingBody:
+    """
+    Iterate a response body chunk by chunk (response.iter_content), so the
+    reader can stop as soon as it has what it needs and the rest of the
+    page is never downloaded.
+    max_bytes: stop reading after this many bytes (truncated is then True)
+    keep: hold on to the chunks read, for .body
+    cache: HttpCache to store the body in (under url) once it has been
+    read in full
+    """
+
+    def __init__(self, response, max_bytes=None, chunk_size=16 * 1024, keep=False, cache=None, url=None):
+        self.response = response
+        self.url = url or response.url
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        # A body served from the cache is already stored
+        self.cache = None if getattr(response, 'from_cache', False) else cache
+        self.keep = keep or self.cache is not None
+        self.bytes_read = 0
+        self.complete = False
+        self.truncated = False
+        self._chunks = []
+        self._reader = None
+
+    def __iter__(self):
+        self._reader = self._read()
+        return self._reader
+
+    def _read(self):
+        start = time.perf_counter()
+        try:
+            for chunk in self.response.iter_content(self.chunk_size):
+                if self.max_bytes is not None and self.bytes_read + len(chunk) > self.max_bytes:
+                    chunk = chunk[:self.max_bytes - self.bytes_read]
+                    self.truncated = True
+                self.bytes_read += len(chunk)
+                if self.keep:
+                    self._chunks.append(chunk)
+                if chunk:
+                    yield chunk
+                if self.truncated:
+                    METRICS.count('truncated_bodies')
+                    return
+            self.complete = True
+            if self.cache is not None and self.response.status_code == 200:
+                self.cache.put(self.url, 200, self.body, self.response.headers)
+        finally:
+            if not getattr(self.response, 'from_cache', False):
+                METRICS.observe('download', time.perf_counter() - start)
+                METRICS.count('body_bytes_read', self.bytes_read)
+
+    @property
+    def body(self):
+        """
+        The bytes read so far (only kept with keep=True or a cache)
+        """
+        return b''.join(self._chunks)
+
+    def close(self):
+        """
+        Drop the connection; unread bytes are never downloaded
+        """
+        if self._reader is not None:
+            self._reader.close()
+        self.response.close()
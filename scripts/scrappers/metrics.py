@@ -0,0 +1,199 @@
+"""
+Stage timers, latency histograms and counters for scrape runs
+
+One process-wide registry (METRICS) is filled in by the scraper modules:
+stage timings for fetch (split into connect and download), decode, parse,
+extract, write and rate-limit wait, and counters by HTTP status,
+extraction method and tier. At the end of a run it is written as a JSON
+summary and as a Prometheus text-format file (node_exporter textfile
+collector layout); a background thread can also rewrite both files every
+few seconds while the crawl runs.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds (seconds) of the latency histogram buckets
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram (not thread-safe, Metrics holds the lock)
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.max = max(self.max, seconds)
+        for i, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-th quantile
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'total_seconds': round(self.sum, 6),
+            'mean_seconds': round(self.sum / self.count, 6) if self.count else 0.0,
+            'p50_seconds': round(self.quantile(0.5), 6),
+            'p99_seconds': round(self.quantile(0.99), 6),
+            'max_seconds': round(self.max, 6),
+        }
+
+
+def _label_text(labels):
+    return ','.join(f'{key}="{value}"' for key, value in labels)
+
+
+class Metrics:
+    """
+    Thread-safe registry of stage histograms and labelled counters
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+        self._started = time.time()
+        self._snapshot_thread = None
+        self._snapshot_stop = threading.Event()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = Histogram()
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, stage):
+        """
+        with METRICS.timer('parse'): ... records the block's wall time
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start)
+
+    def count(self, name, amount=1, **labels):
+        """
+        Increment a counter, e.g. count('http_responses', status=200)
+        """
+        key = (name, tuple(sorted((label, str(value)) for label, value in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._started = time.time()
+
+    def summary(self):
+        """
+        JSON-ready dict: per-stage latency summaries and counters grouped by name
+        """
+        with self._lock:
+            stages = {stage: histogram.summary() for stage, histogram in sorted(self._histograms.items())}
+            counters = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                label_key = ','.join(f'{key}={val}' for key, val in labels) or 'total'
+                counters.setdefault(name, {})[label_key] = value
+        return {
+            'started_at': self._started,
+            'elapsed_seconds': round(time.time() - self._started, 3),
+            'stages': stages,
+            'counters': counters,
+        }
+
+    def prometheus(self, prefix='trailii_scraper'):
+        """
+        The registry in Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            if self._histograms:
+                name = f'{prefix}_stage_seconds'
+                lines.append(f'# HELP {name} Time spent per scrape stage')
+                lines.append(f'# TYPE {name} histogram')
+                for stage, histogram in sorted(self._histograms.items()):
+                    cumulative = 0
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        cumulative += count
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+                    lines.append(f'{name}_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{stage="{stage}"}} {histogram.count}')
+
+            declared = set()
+            for (counter, labels), value in sorted(self._counters.items()):
+                name = f'{prefix}_{counter}_total'
+                if name not in declared:
+                    lines.append(f'# TYPE {name} counter')
+                    declared.add(name)
+                label_text = _label_text(labels)
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_report(self, json_path='scrape_metrics.json', prom_path='scrape_metrics.prom'):
+        """
+        Write the JSON summary and the Prometheus file (each atomically)
+        """
+        for path, text in ((json_path, json.dumps(self.summary(), indent=2)), (prom_path, self.prometheus())):
+            if not path:
+                continue
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(text)
+            os.replace(tmp_path, path)
+
+    def start_snapshots(self, interval=30, json_path='scrape_metrics.json', prom_path='scrape_metrics.prom'):
+        """
+        Rewrite the report every interval seconds until stop_snapshots()
+        """
+        if self._snapshot_thread is not None:
+            return
+
+        def loop():
+            while not self._snapshot_stop.wait(interval):
+                self.write_report(json_path, prom_path)
+
+        self._snapshot_stop.clear()
+        self._snapshot_thread = threading.Thread(target=loop, daemon=True)
+        self._snapshot_thread.start()
+
+    def stop_snapshots(self):
+        if self._snapshot_thread is None:
+            return
+        self._snapshot_stop.set()
+        self._snapshot_thread.join()
+        self._snapshot_thread = None
+
+
+METRICS = Metrics()
@@ -0,0 +1,391 @@
+"""
+Local stand-in for tripadvisor.com for offline end-to-end load tests
+
+Serves generated attraction pages under the real URL layout
+(/Attraction_Review-g189852-d243851-Reviews-Vasa_Museum-Stockholm.html),
+and paginated listings for every geo (/Attractions-g189852-Activities-oa30-
+Stockholm.html, 30 attractions a page plus a sponsored repeat).
+The page for a d-id is always the same (name, duration and markup style
+are derived from the id), while the server injects configurable latency,
+403/429/500/503 responses, Retry-After headers, hung connections and
+slow-drip bodies. /__stats returns what was served so far.
+
+It can also drive the crawler against itself: --load-test N scrapes N
+URLs through scraper2.iter_attractions and reports throughput and retry
+overhead.
+Usage:
+    python3 mock_tripadvisor.py --port 8765 --latency lognormal:-2.5:0.6 --rate-429 0.05
+    python3 mock_tripadvisor.py --load-test 10000 --workers 32 --rate-403 0.02
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ATTRACTION_PATH_RE = re.compile(r'^/Attraction_Review-g(\d+)-d(\d+)-Reviews-([^/]*?)\.html$')
+LISTING_PATH_RE = re.compile(r'^/Attractions-g(\d+)-Activities(?:-oa(\d+))?(?:-[^/]*)?\.html$')
+LISTING_PAGE_SIZE = 30
+
+DEFAULT_MIX = {'selector': 0.45, 'keyword': 0.2, 'json-ld': 0.2, 'missing': 0.1, 'shell': 0.05}
+DURATIONS = ['30 minutes', '1 hour', '1-2 hours', '2-3 hours', 'More than 3 hours', '60–75 minutes']
+NAME_WORDS = ['Royal', 'Old', 'City', 'Nordic', 'Maritime', 'Palace', 'Museum', 'Garden',
+              'Gallery', 'Church', 'Tower', 'Market', 'Park', 'Hall', 'Island', 'Bridge']
+
+
+def parse_latency(spec):
+    """
+    Latency distribution from a spec string, returned as a sampler(rng)
+    fixed:S | uniform:LO:HI | normal:MEAN:SD | lognormal:MU:SIGMA | exponential:MEAN
+    (seconds; negative samples are clamped to zero)
+    """
+    kind, _, args = spec.partition(':')
+    values = [float(value) for value in args.split(':')] if args else []
+    if kind == 'fixed':
+        return lambda rng: values[0] if values else 0.0
+    if kind == 'uniform':
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == 'normal':
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if kind == 'lognormal':
+        return lambda rng: rng.lognormvariate(values[0], values[1])
+    if kind == 'exponential':
+        return lambda rng: rng.expovariate(1 / values[0])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def attraction_url(base_url, geo_id, location_id, city='Stockholm'):
+    return f"{base_url}/Attraction_Review-g{geo_id}-d{location_id}-Reviews-Attraction_{location_id}-{city}.html"
+
+
+def mock_urls(base_url, count, geo_id=189852, first_id=100000):
+    """
+    Lazily yield count attraction URLs on the mock server
+    """
+    for location_id in range(first_id, first_id + count):
+        yield attraction_url(base_url, geo_id, location_id)
+
+
+def attraction_fixture(location_id, mix=DEFAULT_MIX):
+    """
+    (name, duration, kind) for a d-id; stable across requests and restarts
+    """
+    rng = random.Random(location_id)
+    name = f"{rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {location_id}"
+    kind = rng.choices(list(mix), weights=list(mix.values()))[0]
+    return name, rng.choice(DURATIONS), kind
+
+
+def listing_ids(geo_id, size, first_id=100000):
+    """
+    The d-ids listed for a geo, in listing order (same ids as mock_urls)
+    """
+    ids = list(range(first_id, first_id + size))
+    random.Random(geo_id).shuffle(ids)
+    return ids
+
+
+def render_listing(geo_id, offset, size, mix=DEFAULT_MIX):
+    """
+    One listing page: up to 30 attraction links, the geo's first attraction
+    again as a sponsored card, and pagination links to the next five pages
+    and the last one, like the real site. Offsets past the end list nothing.
+    """
+    ids = listing_ids(geo_id, size)
+    page_ids = ids[offset:offset + LISTING_PAGE_SIZE]
+    if page_ids and ids:
+        page_ids = [ids[0]] + page_ids
+    cards = ''.join(
+        f'<div class="attraction-card"><a href="/Attraction_Review-g{geo_id}-d{location_id}-Reviews-'
+        f'Attraction_{location_id}-Mock_City.html">{attraction_fixture(location_id, mix)[0]}</a></div>\n'
+        for location_id in page_ids
+    )
+    last = max(0, (size - 1) // LISTING_PAGE_SIZE * LISTING_PAGE_SIZE)
+    linked = sorted({page for page in range(offset + LISTING_PAGE_SIZE, offset + 6 * LISTING_PAGE_SIZE,
+                                            LISTING_PAGE_SIZE) if page <= last} | {last})
+    pagination = ''.join(
+        f'<a class="page" href="/Attractions-g{geo_id}-Activities-oa{page}-Mock_City.html">'
+        f'{page // LISTING_PAGE_SIZE + 1}</a>'
+        for page in linked if page
+    )
+    return (f'<html><head><title>Things to do - Tripadvisor</title></head><body>'
+            f'<h1>Things to Do in Mock City</h1>{cards}<div class="pagination">{pagination}</div>'
+            f'</body></html>').encode('utf-8')
+
+
+def render_page(location_id, mix=DEFAULT_MIX, filler_kb=40):
+    """
+    HTML for an attraction: the duration sits in a data-test-target div, a
+    'Suggested duration' text, JSON-LD, nowhere ('missing'), or the page is
+    an empty client-rendered shell ('shell')
+    """
+    name, duration, kind = attraction_fixture(location_id, mix)
+    if kind == 'shell':
+        return ('<html><head><title>Tripadvisor</title></head><body><div id="root"></div>'
+                '<script>window.__WEB_CONTEXT__={"pageManifest":{}};</script>'
+                '<script src="/app.js"></script></body></html>').encode('utf-8')
+
+    filler = ''.join(
+        f'<div class="review-card"><p>Review {i} of {name}: lovely place, friendly staff, '
+        f'worth a visit when in town.</p></div>\n'
+        for i in range(max(1, filler_kb * 1024 // 110))
+    )
+    if kind == 'selector':
+        snippet = f'<div data-test-target="duration">{duration}</div>'
+    elif kind == 'keyword':
+        snippet = f'<div class="poi-about">Suggested duration: {duration}</div>'
+    elif kind == 'json-ld':
+        snippet = ('<script type="application/ld+json">'
+                   + json.dumps({'@context': 'https://schema.org', '@type': 'TouristAttraction',
+                                 'name': name, 'timeRequired': duration})
+                   + '</script>')
+    else:
+        snippet = '<div class="poi-about">Open daily</div>'
+    return (f'<html><head><title>{name} - Tripadvisor</title></head><body>'
+            f'<h1>{name}</h1>{snippet}\n{filler}</body></html>').encode('utf-8')
+
+
+class MockConfig:
+    """
+    latency: spec for parse_latency, applied before every response
+    rate_403 / rate_429 / rate_500 / rate_503 / rate_timeout: share of requests failed
+    that way (a timeout holds the connection for hang_seconds, then drops it)
+    retry_after: Retry-After seconds sent with 429 and 503, None for no header
+    drip_rate: share of pages sent slowly, drip_bytes_per_second at a time
+    mix: weights of the page kinds (see render_page)
+    listing_size: attractions listed for every geo
+    """
+
+    def __init__(self, latency='fixed:0', rate_403=0.0, rate_429=0.0, rate_500=0.0, rate_503=0.0,
+                 rate_timeout=0.0, retry_after=1, hang_seconds=20, drip_rate=0.0, drip_bytes_per_second=64 * 1024,
+                 mix=None, filler_kb=40, listing_size=300, seed=None):
+        self.latency = latency
+        self.sample_latency = parse_latency(latency)
+        self.rate_403 = rate_403
+        self.rate_429 = rate_429
+        self.rate_500 = rate_500
+        self.rate_503 = rate_503
+        self.rate_timeout = rate_timeout
+        self.retry_after = retry_after
+        self.hang_seconds = hang_seconds
+        self.drip_rate = drip_rate
+        self.drip_bytes_per_second = drip_bytes_per_second
+        self.mix = mix or DEFAULT_MIX
+        self.filler_kb = filler_kb
+        self.listing_size = listing_size
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """
+        (latency, outcome, drip) for one request; outcome is 'ok', 403, 429,
+        500, 503 or 'timeout'
+        """
+        with self.lock:
+            latency = self.sample_latency(self.rng)
+            roll = self.rng.random()
+            drip = self.rng.random() < self.drip_rate
+        for outcome, rate in ((403, self.rate_403), (429, self.rate_429), (500, self.rate_500),
+                              (503, self.rate_503), ('timeout', self.rate_timeout)):
+            if roll < rate:
+                return latency, outcome, drip
+            roll -= rate
+        return latency, 'ok', drip
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'MockTripadvisor/1.0'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if self.path == '/__stats':
+            return self._send(200, json.dumps(server.stats_snapshot()).encode('utf-8'), 'application/json')
+
+        path = self.path.split('?')[0]
+        match = ATTRACTION_PATH_RE.match(path)
+        listing = LISTING_PATH_RE.match(path) if match is None else None
+        if match is None and listing is None:
+            server.count('404')
+            return self._send(404, b'<html><body>Not found</body></html>')
+
+        config = server.config
+        latency, outcome, drip = config.draw()
+        if latency:
+            time.sleep(latency)
+
+        if outcome == 'timeout':
+            server.count('timeout')
+            time.sleep(config.hang_seconds)
+            self.close_connection = True
+            return
+        if outcome != 'ok':
+            server.count(str(outcome))
+            headers = {}
+            if outcome in (429, 503) and config.retry_after is not None:
+                headers['Retry-After'] = str(config.retry_after)
+            body = b'<html><body>Access denied</body></html>' if outcome == 403 else b'<html><body>Error</body></html>'
+            return self._send(outcome, body, headers=headers)
+
+        if listing is not None:
+            body = render_listing(int(listing.group(1)), int(listing.group(2) or 0), config.listing_size,
+                                  config.mix)
+            server.count('200-listing')
+            return self._send(200, body)
+
+        body = render_page(int(match.group(2)), config.mix, config.filler_kb)
+        server.count('200-drip' if drip else '200')
+        self._send(200, body, drip_bytes_per_second=config.drip_bytes_per_second if drip else None)
+
+    def _send(self, status, body, content_type='text/html; charset=utf-8', headers=None,
+              drip_bytes_per_second=None):
+        try:
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            if not drip_bytes_per_second:
+                self.wfile.write(body)
+                return
+            # Slow drip: a tenth of a second's worth of bytes at a time
+            step = max(1, drip_bytes_per_second // 10)
+            for start in range(0, len(body), step):
+                self.wfile.write(body[start:start + step])
+                self.wfile.flush()
+                time.sleep(0.1)
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+
+
+class MockServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, address, config):
+        super().__init__(address, MockHandler)
+        self.config = config
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def count(self, outcome):
+        with self._stats_lock:
+            self.stats[outcome] += 1
+
+    def stats_snapshot(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+
+def start_server(config=None, host='127.0.0.1', port=0):
+    """
+    Start the mock on a background thread; port 0 picks a free port.
+    Returns (server, base_url); stop it with server.shutdown()
+    """
+    server = MockServer((host, port), config or MockConfig())
+    threading.Thread(target=server.serve_forever, name='mock-tripadvisor', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def run_load_test(count, config, workers=16, requests_per_second=1000, stream=False):
+    """
+    Crawl count mock URLs with scraper2 and print throughput and retry overhead
+    stream: use scraper2's streaming mode and report the body bytes read
+    """
+    import scraper2
+    from metrics import METRICS
+    from retry_policy import RetryPolicy
+
+    server, base_url = start_server(config)
+    # Same policy shape as production, with the backoff scaled down to the mock's timings
+    retry_policy = RetryPolicy(
+        rules={key: {'base_delay': 0.2} for key in ('403', '429', '503', '5xx', 'network')},
+        max_delay=5,
+    )
+    print(f"🧪 Load test: {count} URLs, {workers} workers against {base_url}")
+    start = time.perf_counter()
+    succeeded = 0
+    done = 0
+    try:
+        for result in scraper2.iter_attractions(mock_urls(base_url, count), max_workers=workers,
+                                                requests_per_second=requests_per_second, jitter=0,
+                                                retry_policy=retry_policy, stream=stream):
+            done += 1
+            succeeded += result['success']
+            if done % 1000 == 0:
+                print(f"   {done}/{count} ({done / (time.perf_counter() - start):.0f} pages/s)")
+    finally:
+        elapsed = time.perf_counter() - start
+        stats = server.stats_snapshot()
+        server.shutdown()
+
+    served = sum(stats.values())
+    print(f"\n📊 {done} URLs in {elapsed:.1f}s: {done / elapsed:.1f} pages/s")
+    print(f"   Successful extractions: {succeeded}/{done}")
+    print(f"   Requests served: {served} ({served / done if done else 0:.2f} per URL, retry overhead "
+          f"{(served - done) / done if done else 0:.0%})")
+    print(f"   Responses: {stats}")
+    if stream:
+        body_bytes = METRICS.summary()['counters'].get('body_bytes_read', {}).get('total', 0)
+        print(f"   Body bytes read: {body_bytes / 1024:.0f} KB ({body_bytes / done / 1024 if done else 0:.1f} KB per URL)")
+    return {'urls': done, 'seconds': elapsed, 'succeeded': succeeded, 'requests': served, 'responses': stats}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Local mock TripAdvisor server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', default='fixed:0', help='e.g. uniform:0.05:0.3 or lognormal:-2.5:0.6')
+    parser.add_argument('--rate-403', type=float, default=0.0)
+    parser.add_argument('--rate-429', type=float, default=0.0)
+    parser.add_argument('--rate-500', type=float, default=0.0)
+    parser.add_argument('--rate-503', type=float, default=0.0)
+    parser.add_argument('--rate-timeout', type=float, default=0.0)
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After seconds on 429/503 (-1: none)')
+    parser.add_argument('--hang-seconds', type=float, default=20)
+    parser.add_argument('--drip-rate', type=float, default=0.0, help='share of pages sent slowly')
+    parser.add_argument('--drip-bytes-per-second', type=int, default=64 * 1024)
+    parser.add_argument('--filler-kb', type=int, default=40, help='approximate page size')
+    parser.add_argument('--listing-size', type=int, default=300, help='attractions listed per geo')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--load-test', type=int, metavar='N', help='crawl N mock URLs and report, then exit')
+    parser.add_argument('--workers', type=int, default=16, help='scraper workers for --load-test')
+    parser.add_argument('--stream', action='store_true', help='stream pages in --load-test')
+    args = parser.parse_args(argv)
+
+    config = MockConfig(
+        latency=args.latency, rate_403=args.rate_403, rate_429=args.rate_429, rate_500=args.rate_500,
+        rate_503=args.rate_503, rate_timeout=args.rate_timeout, retry_after=None if args.retry_after < 0 else args.retry_after,
+        hang_seconds=args.hang_seconds, drip_rate=args.drip_rate,
+        drip_bytes_per_second=args.drip_bytes_per_second, filler_kb=args.filler_kb,
+        listing_size=args.listing_size, seed=args.seed,
+    )
+
+    if args.load_test:
+        run_load_test(args.load_test, config, workers=args.workers, stream=args.stream)
+        return
+
+    server = MockServer((args.host, args.port), config)
+    base_url = f"http://{args.host}:{args.port}"
+    print(f"🧪 Mock TripAdvisor on {base_url}")
+    print(f"   e.g. {attraction_url(base_url, 189852, 243851)}")
+    print(f"   listings: {base_url}/Attractions-g189852-Activities-oa30-Mock_City.html")
+    print(f"   stats: {base_url}/__stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Network capture for the browser tier
+
+The rendered attraction page builds its DOM from JSON the page itself
+fetches in the background (XHR / fetch). With Chrome's performance log
+enabled (goog:loggingPrefs) every Network event is buffered by the
+driver; NetworkCapture reads those events, asks the browser for the body
+of each finished JSON response (Network.getResponseBody) and looks for the
+duration and name with structured_data.find_fields. The scraper can
+return as soon as a response carries the duration, without waiting for
+layout or walking the DOM.
+"""
+
+import json
+import logging
+import time
+
+from browser_pool import is_driver_crash
+from structured_data import extract_json
+
+log = logging.getLogger(__name__)
+
+LOGGING_PREFS = {'performance': 'ALL'}
+# Resource types of the page's own API calls
+API_RESOURCE_TYPES = ('XHR', 'Fetch')
+
+
+def enable_network_capture(chrome_options):
+    """
+    Turn on the performance log that NetworkCapture reads
+    """
+    chrome_options.set_capability('goog:loggingPrefs', LOGGING_PREFS)
+
+
+def is_json_response(params):
+    """
+    True for a Network.responseReceived event of an API call returning JSON
+    """
+    mime_type = (params.get('response') or {}).get('mimeType') or ''
+    return params.get('type') in API_RESOURCE_TYPES and 'json' in mime_type
+
+
+class NetworkCapture:
+    """
+    Reads one page's JSON responses from a driver's performance log
+    """
+
+    def __init__(self, driver):
+        self.driver = driver
+        # request id -> URL of JSON responses still downloading
+        self.pending = {}
+        self.responses = 0
+        self.loaded = False
+
+    def reset(self):
+        """
+        Drop buffered events (call before driver.get, so responses of the
+        previous page are not read)
+        """
+        self.driver.get_log('performance')
+        self.pending.clear()
+        self.responses = 0
+        self.loaded = False
+
+    def _finished(self):
+        """
+        Drain the performance log, returning (request id, URL) of the JSON
+        responses that finished loading since the last call
+        """
+        finished = []
+        for entry in self.driver.get_log('performance'):
+            try:
+                message = json.loads(entry['message'])['message']
+            except (KeyError, ValueError):
+                continue
+            method = message.get('method')
+            params = message.get('params') or {}
+            if method == 'Network.responseReceived' and is_json_response(params):
+                self.pending[params['requestId']] = params['response'].get('url')
+            elif method == 'Network.loadingFinished' and params.get('requestId') in self.pending:
+                request_id = params['requestId']
+                finished.append((request_id, self.pending.pop(request_id)))
+            elif method == 'Network.loadingFailed':
+                self.pending.pop(params.get('requestId'), None)
+            elif method == 'Page.loadEventFired':
+                self.loaded = True
+        return finished
+
+    def _body(self, request_id):
+        try:
+            response = self.driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+        except Exception as e:
+            # The browser evicts bodies it no longer needs; that is not a crash
+            if is_driver_crash(e):
+                raise
+            log.debug("  ⚠️  No body for request %s: %s", request_id, e)
+            return None
+        if response.get('base64Encoded'):
+            return None
+        return response.get('body')
+
+    def wait_for_fields(self, timeout=10, settle=1.0, poll_frequency=0.2):
+        """
+        Return {'name', 'duration', 'rule'} from the first JSON response that
+        carries a duration. Gives up after timeout seconds, or settle seconds
+        after the page's load event with no JSON response in flight; name
+        and duration are None when no response had them.
+        """
+        deadline = time.monotonic() + timeout
+        settled_at = None
+        name = None
+        while True:
+            for request_id, url in self._finished():
+                self.responses += 1
+                body = self._body(request_id)
+                # Only pay for decoding when the body can contain a duration
+                if not body or ('uration' not in body and name is not None):
+                    continue
+                extracted = extract_json(body)
+                name = name or extracted['name']
+                if extracted['duration']:
+                    log.debug("  🛰️  Duration in %s", url)
+                    return {'name': extracted['name'] or name, 'duration': extracted['duration'],
+                            'rule': extracted['rule']}
+
+            now = time.monotonic()
+            if self.loaded and not self.pending:
+                settled_at = settled_at or now + settle
+            else:
+                settled_at = None
+            if now >= deadline or (settled_at is not None and now >= settled_at):
+                return {'name': name, 'duration': None, 'rule': None}
+            time.sleep(poll_frequency)
@@ -0,0 +1,252 @@
+"""
+Match scraped attractions to the app's Google places
+
+The scraped names ("Rådhuset (Town Hall)") and the Google Places names the
+app shows rarely agree character for character, and comparing every
+place with every attraction is O(n·m). Instead the attraction names are
+normalised (duration_index.normalize_name: lowercase, å/ä/ö and other
+accents folded) and split into character trigrams kept in an inverted
+index. Exact normalised names are found with one dict lookup. Names that
+differ by a word ("Skansen" / "Skansen Open-Air Museum") are found through
+their rarest shared word; only for misspellings are the attractions
+sharing the query's rarest trigrams counted. Word candidates are scored
+by the mean of how much of the smaller trigram set the other contains and
+the Dice coefficient of the two sets, misspelling candidates by Dice
+alone; only equal sets score 1.0. A lookup reads a bounded slice of the
+index whatever its size. A query made only of
+generic words ("Museum", "Old Town") matches exact names only. Candidates
+can be narrowed to one TripAdvisor geo id; the scraped results carry no
+coordinates, so there is no distance filter.
+Usage: python3 place_matcher.py stockholm_attractions.sqlite places.json --geo-id 189852 [--output matches.csv]
+"""
+
+import argparse
+import csv
+import json
+import re
+import time
+from collections import Counter
+
+from duration_index import normalize_name, read_results
+from tripadvisor_urls import parse_attraction_url
+
+NGRAM = 3
+MATCH_FIELDS = ['place_id', 'place_name', 'location_id', 'attraction_name', 'score']
+
+_PARENS_RE = re.compile(r'\(([^)]*)\)')
+
+# Words that name a kind of place rather than one place; never enough on
+# their own to find a candidate
+GENERIC_WORDS = frozenset([
+    'the', 'of', 'and', 'de', 'la', 'le', 'st', 'saint',
+    'museum', 'museet', 'gallery', 'park', 'parken', 'garden', 'gardens', 'church', 'kyrka', 'kyrkan',
+    'cathedral', 'palace', 'slott', 'slottet', 'castle', 'tower', 'square', 'torg', 'torget',
+    'market', 'hall', 'bridge', 'island', 'old', 'town', 'city', 'center', 'centre', 'zoo',
+    'aquarium', 'theatre', 'theater', 'library', 'harbour', 'harbor', 'beach', 'memorial',
+    'monument', 'viewpoint', 'tour', 'tours',
+])
+
+
+def name_variants(name):
+    """
+    Normalised forms a name is indexed and looked up under: the whole name
+    and, for "Rådhuset (Town Hall)", also "radhuset" and "town hall"
+    """
+    variants = [normalize_name(name)]
+    inner = _PARENS_RE.findall(name or '')
+    if inner:
+        variants.append(normalize_name(_PARENS_RE.sub(' ', name)))
+        variants.extend(normalize_name(part) for part in inner)
+    return [variant for i, variant in enumerate(variants) if variant and variant not in variants[:i]]
+
+
+def ngrams(text, n=NGRAM):
+    padded = f" {text} "
+    return frozenset(padded[i:i + n] for i in range(len(padded) - n + 1))
+
+
+def dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+def word_score(a, b):
+    """
+    Similarity of two trigram sets that share a word: the mean of the
+    overlap coefficient (1.0 when one name is contained in the other) and
+    Dice, so a contained name scores high but below an equal one
+    """
+    shared = len(a & b)
+    return (shared / min(len(a), len(b)) + 2 * shared / (len(a) + len(b))) / 2
+
+
+class AttractionIndex:
+    """
+    Word and trigram inverted index over attraction names
+    word_limit: words in more names than this ("museum") are not used to
+    find candidates
+    rare_grams / scan_budget: candidates come from the query's rare_grams
+    rarest trigrams, then from further ones while fewer than scan_budget
+    postings have been read; common trigrams ("mus", "um ") are never read
+    candidates: how many of the best-overlapping names get a full score
+    """
+
+    def __init__(self, word_limit=50, rare_grams=5, scan_budget=400, candidates=10):
+        self.word_limit = word_limit
+        self.rare_grams = rare_grams
+        self.scan_budget = scan_budget
+        self.candidates = candidates
+        # entry id -> (key, name, geo_id)
+        self.entries = []
+        # variant id -> trigram set / entry id
+        self._grams = []
+        self._variant_entry = []
+        # normalised variant -> entry ids
+        self._exact = {}
+        # word -> variant ids
+        self._words = {}
+        # gram -> variant ids, for all entries and per geo id
+        self._postings = {}
+        self._geo_postings = {}
+
+    def add(self, key, name, geo_id=None):
+        entry = len(self.entries)
+        self.entries.append((key, name, geo_id))
+        geo_postings = self._geo_postings.setdefault(geo_id, {}) if geo_id is not None else None
+        for variant in name_variants(name):
+            variant_id = len(self._grams)
+            grams = ngrams(variant)
+            self._grams.append(grams)
+            self._variant_entry.append(entry)
+            self._exact.setdefault(variant, []).append(entry)
+            for word in set(variant.split()):
+                self._words.setdefault(word, []).append(variant_id)
+            for gram in grams:
+                self._postings.setdefault(gram, []).append(variant_id)
+                if geo_postings is not None:
+                    geo_postings.setdefault(gram, []).append(variant_id)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def match(self, name, geo_id=None, min_score=0.5, limit=1):
+        """
+        Best matching attractions for a name as a list of
+        {'key', 'name', 'score'}, best first; score is 1.0 for equal
+        normalised names, word_score for a shared distinctive word
+        ("Skansen" / "Skansen Open-Air Museum", either way round) and the
+        Dice coefficient of the trigram sets for anything else
+        geo_id: only attractions scraped under this geo
+        """
+        postings = self._postings if geo_id is None else self._geo_postings.get(geo_id, {})
+        variants = name_variants(name)
+        best = {}
+
+        def consider(entry, score):
+            if score < min_score or score <= best.get(entry, 0):
+                return
+            if geo_id is not None and self.entries[entry][2] != geo_id:
+                return
+            best[entry] = score
+
+        for variant in variants:
+            for entry in self._exact.get(variant, ()):
+                consider(entry, 1.0)
+        if len(best) >= limit:
+            return self._ranked(best, limit)
+
+        # Only distinctive words may find a candidate
+        variants = [variant for variant in variants
+                    if any(word not in GENERIC_WORDS for word in variant.split())]
+        queries = [ngrams(variant) for variant in variants]
+
+        for variant, query in zip(variants, queries):
+            words = set(variant.split()) - GENERIC_WORDS
+            postings_by_size = sorted((self._words[word] for word in words if word in self._words), key=len)
+            if postings_by_size and len(postings_by_size[0]) <= self.word_limit:
+                for variant_id in set(postings_by_size[0]):
+                    consider(self._variant_entry[variant_id], word_score(query, self._grams[variant_id]))
+        if len(best) >= limit:
+            return self._ranked(best, limit)
+
+        for query in queries:
+            found = sorted((postings[gram] for gram in query if gram in postings), key=len)
+            counts = Counter()
+            scanned = 0
+            for i, posting in enumerate(found):
+                if i >= self.rare_grams and scanned + len(posting) > self.scan_budget:
+                    break
+                counts.update(posting)
+                scanned += len(posting)
+
+            for variant_id, _ in counts.most_common(self.candidates):
+                consider(self._variant_entry[variant_id], dice(query, self._grams[variant_id]))
+        return self._ranked(best, limit)
+
+    def _ranked(self, best, limit):
+        ranked = sorted(best.items(), key=lambda item: -item[1])[:limit]
+        return [{'key': self.entries[entry][0], 'name': self.entries[entry][1], 'score': round(score, 3)}
+                for entry, score in ranked]
+
+
+def index_results(results, index=None):
+    """
+    AttractionIndex over scrape results; failed rows carry placeholder
+    names ('Request failed') and are left out
+    """
+    index = index if index is not None else AttractionIndex()
+    for result in results:
+        if str(result.get('success')).lower() not in ('true', '1'):
+            continue
+        parsed = parse_attraction_url(result.get('url') or '')
+        if parsed is None:
+            continue
+        geo_id, location_id = parsed
+        index.add(location_id, result['name'], geo_id)
+    return index
+
+
+def match_places(index, places, geo_id=None, min_score=0.6):
+    """
+    Yield one MATCH_FIELDS row per place; location_id is None when no
+    attraction scored at least min_score
+    """
+    for place in places:
+        matches = index.match(place.get('name'), geo_id, min_score)
+        match = matches[0] if matches else {'key': None, 'name': None, 'score': 0.0}
+        yield {
+            'place_id': place.get('id') or place.get('place_id'),
+            'place_name': place.get('name'),
+            'location_id': match['key'],
+            'attraction_name': match['name'],
+            'score': match['score'],
+        }
+
+
+# ===== MAIN =====
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Match scraped attractions to Google places')
+    parser.add_argument('results', help='ResultsStore .sqlite, .csv or .jsonl results')
+    parser.add_argument('places', help='JSON list of Google places')
+    parser.add_argument('--geo-id', type=int, help='only match attractions of this TripAdvisor geo')
+    parser.add_argument('--min-score', type=float, default=0.6)
+    parser.add_argument('--output', default='place_matches.csv')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = index_results(read_results(args.results))
+    print(f"🗂️  Indexed {len(index)} attractions in {time.perf_counter() - start:.2f}s")
+
+    with open(args.places, encoding='utf-8') as f:
+        places = json.load(f)
+    start = time.perf_counter()
+    matched = 0
+    with open(args.output, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.DictWriter(f, fieldnames=MATCH_FIELDS)
+        writer.writeheader()
+        for row in match_places(index, places, args.geo_id, args.min_score):
+            matched += row['location_id'] is not None
+            writer.writerow(row)
+    elapsed = time.perf_counter() - start
+    print(f"🔗 Matched {matched}/{len(places)} places in {elapsed:.2f}s "
+          f"({len(places) / elapsed if elapsed else 0:.0f} places/s)")
+    print(f"💾 Data saved to: {args.output}")
@@ -0,0 +1,309 @@
+"""
+Staleness-driven recrawl scheduler
+
+A nightly refresh should not spend the rate-limit budget equally on every
+known attraction: most durations never change, a few change often, and
+the ones that failed or were never scraped have no value at all yet. The
+scheduler keeps per-attraction history next to the results (a recrawl
+table in the ResultsStore's SQLite file): when it was last fetched, how
+often a refetch found a different duration, how many fetches in a row
+failed, and a weight set when URLs are added.
+
+Each run scores every attraction with the chance that its stored duration
+is out of date, times its weight:
+
+    change rate  = (changes + 1) / (observed time + PRIOR_SECONDS)
+    value        = weight * (1 - exp(-change rate * age))
+
+A never-scraped URL is worth its full weight; one that keeps failing is
+halved for every failure in a row and waits out an exponential backoff.
+A heap picks the budget's most valuable URLs, they are scraped with any
+backend and the results update both the store and the history. Backends
+that retry are run with a single-attempt retry policy: a failure is
+retried by a later run after its backoff, so every planned URL costs one
+request (plus a browser render when the tiered backend escalates it).
+With --max-minutes no new URL is started once the time is up; the ones
+already in flight still finish and are recorded.
+Usage:
+    python3 recrawl_scheduler.py add urls.txt [--weight 2]
+    python3 recrawl_scheduler.py plan --budget 200
+    python3 recrawl_scheduler.py run --budget 200 --max-minutes 60 [--backend tiered]
+"""
+
+import argparse
+import heapq
+import importlib
+import logging
+import math
+import sqlite3
+import threading
+import time
+
+from duration_normalizer import normalize_duration
+from metrics import METRICS
+from results_store import ResultsStore
+from retry_policy import single_attempt_policy
+from tripadvisor_urls import attraction_key
+
+log = logging.getLogger(__name__)
+
+# Backends whose iter_attractions takes a retry_policy
+RETRYING_BACKENDS = ('http', 'tiered')
+
+DAY = 24 * 3600
+# Prior belief before any history: about one change per 90 days
+PRIOR_SECONDS = 90 * DAY
+# Never refetch a page sooner than this after a successful fetch
+MIN_INTERVAL = DAY
+# Wait after the n-th failure in a row: FAILURE_BACKOFF * 2**(n-1), at most MAX_BACKOFF
+FAILURE_BACKOFF = 6 * 3600
+MAX_BACKOFF = 14 * DAY
+
+
+def duration_signature(duration):
+    """
+    What counts as "the same duration" when a page is refetched:
+    "1-2 hours" and "1–2 hrs" match, unparsed text is compared as is
+    """
+    normalized = normalize_duration(duration)
+    if normalized['duration_status'] == 'ok':
+        return f"{normalized['min_minutes']}-{normalized['max_minutes']}"
+    return (duration or '').strip().lower()
+
+
+def refetch_value(row, now):
+    """
+    Expected value of refetching one attraction now (0 when it must wait)
+    row: (weight, first_fetched_at, last_fetched_at, last_success_at, changes, failures)
+    """
+    weight, first_fetched_at, last_fetched_at, last_success_at, changes, failures = row
+    if last_fetched_at is None:
+        return weight
+    if failures:
+        backoff = min(FAILURE_BACKOFF * 2 ** (failures - 1), MAX_BACKOFF)
+        if now - last_fetched_at < backoff:
+            return 0.0
+        if last_success_at is None:
+            return weight * 0.5 ** failures
+    age = now - last_success_at
+    if age < MIN_INTERVAL:
+        return 0.0
+    rate = (changes + 1) / (max(0.0, last_success_at - first_fetched_at) + PRIOR_SECONDS)
+    return weight * (1 - math.exp(-rate * age)) * 0.5 ** failures
+
+
+class RecrawlScheduler:
+    """
+    store: ResultsStore the results go to; the history lives in its file
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(store.path, timeout=60, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS recrawl (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                weight REAL NOT NULL DEFAULT 1.0,
+                fetches INTEGER NOT NULL DEFAULT 0,
+                changes INTEGER NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                first_fetched_at REAL,
+                last_fetched_at REAL,
+                last_success_at REAL,
+                signature TEXT
+            )
+            """
+        )
+        self._db.commit()
+
+    def add(self, urls, weight=1.0):
+        """
+        Track URLs (any iterable); a known URL only gets the new weight.
+        Attractions the store already has start from its last fetch instead
+        of being due at once. Returns how many were new.
+        """
+        with self._lock:
+            before = self._db.execute("SELECT COUNT(*) FROM recrawl").fetchone()[0]
+            for url in urls:
+                key = attraction_key(url)
+                known = self._db.execute(
+                    """
+                    SELECT attempts, success, first_attempt_at, last_attempt_at, succeeded_at, duration
+                    FROM results WHERE key = ?
+                    """,
+                    (key,),
+                ).fetchone()
+                attempts, success, first_at, last_at, success_at, duration = known or (0, 1, None, None, None, None)
+                self._db.execute(
+                    """
+                    INSERT INTO recrawl (key, url, weight, fetches, failures, first_fetched_at, last_fetched_at,
+                                         last_success_at, signature)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(key) DO UPDATE SET weight = excluded.weight
+                    """,
+                    (key, url, weight, attempts, 0 if success else attempts, first_at, last_at, success_at,
+                     duration_signature(duration) if success and duration else None),
+                )
+            self._db.commit()
+            return self._db.execute("SELECT COUNT(*) FROM recrawl").fetchone()[0] - before
+
+    def plan(self, budget, now=None):
+        """
+        The budget most valuable URLs to refetch, best first, as
+        (value, url) pairs; URLs that are fresh or backing off are left out
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            cursor = self._db.execute(
+                """
+                SELECT url, weight, first_fetched_at, last_fetched_at, last_success_at, changes, failures
+                FROM recrawl
+                """
+            )
+            # nlargest keeps a heap of budget entries, not the whole table
+            scored = ((refetch_value(row[1:], now), row[0]) for row in cursor)
+            return heapq.nlargest(budget, (item for item in scored if item[0] > 0))
+
+    def record(self, result, now=None):
+        """
+        Commit a result to the store and update the attraction's history:
+        a success with a different duration than last time is a change
+        """
+        now = time.time() if now is None else now
+        self.store.record(result)
+        key = attraction_key(result['url'])
+        with self._lock:
+            row = self._db.execute("SELECT signature FROM recrawl WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._db.execute("INSERT INTO recrawl (key, url) VALUES (?, ?)", (key, result['url']))
+                row = (None,)
+            if result['success']:
+                signature = duration_signature(result['duration'])
+                changed = row[0] is not None and signature != row[0]
+                METRICS.count('recrawl_results', changed=changed)
+                self._db.execute(
+                    """
+                    UPDATE recrawl SET fetches = fetches + 1, changes = changes + ?, failures = 0,
+                        first_fetched_at = COALESCE(first_fetched_at, ?), last_fetched_at = ?,
+                        last_success_at = ?, signature = ?
+                    WHERE key = ?
+                    """,
+                    (1 if changed else 0, now, now, now, signature, key),
+                )
+            else:
+                METRICS.count('recrawl_results', changed='failed')
+                self._db.execute(
+                    """
+                    UPDATE recrawl SET fetches = fetches + 1, failures = failures + 1,
+                        first_fetched_at = COALESCE(first_fetched_at, ?), last_fetched_at = ?
+                    WHERE key = ?
+                    """,
+                    (now, now, key),
+                )
+            self._db.commit()
+
+    def run(self, iter_attractions, budget, max_seconds=None, **options):
+        """
+        Refetch the planned URLs with a backend's iter_attractions(urls,
+        **options). For the budget to count requests, options should carry
+        retry_policy=single_attempt_policy() when the backend retries.
+        After max_seconds no further URL is handed to the backend; requests
+        already in flight have been paid for, so their results are still
+        recorded.
+        Returns {'planned', 'fetched', 'succeeded', 'changed', 'value'}.
+        """
+        planned = self.plan(budget)
+        deadline = time.monotonic() + max_seconds if max_seconds else None
+        summary = {'planned': len(planned), 'fetched': 0, 'succeeded': 0, 'changed': 0,
+                   'value': round(sum(value for value, _ in planned), 2)}
+        changes_before = self.total_changes()
+
+        def feed():
+            # Backends pull URLs lazily, so stopping here stops new requests
+            for started, (_, url) in enumerate(planned):
+                if deadline is not None and time.monotonic() >= deadline:
+                    log.info("⏱️  Time budget used up after starting %d of %d URLs", started, len(planned))
+                    return
+                yield url
+
+        results = iter_attractions(feed(), **options)
+        try:
+            for result in results:
+                self.record(result)
+                summary['fetched'] += 1
+                summary['succeeded'] += result['success']
+        finally:
+            results.close()
+        summary['changed'] = self.total_changes() - changes_before
+        return summary
+
+    def total_changes(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(changes), 0) FROM recrawl").fetchone()[0]
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM recrawl").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def main(argv=None):
+    import scrape
+
+    parser = argparse.ArgumentParser(description='Recrawl the most stale attractions first')
+    parser.add_argument('--store', default='stockholm_attractions.sqlite', help='ResultsStore with the history')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help='track URLs (one per line)')
+    add.add_argument('file')
+    add.add_argument('--weight', type=float, default=1.0, help='how much fresh data for these URLs is worth')
+
+    for name in ('plan', 'run'):
+        command = commands.add_parser(name, help='show the next refetches' if name == 'plan'
+                                      else 'refetch the most valuable URLs')
+        command.add_argument('--budget', type=int, default=200, help='requests to spend')
+        if name == 'run':
+            command.add_argument('--max-minutes', type=float, help='stop after this long')
+            command.add_argument('--backend', choices=sorted(scrape.BACKENDS), default='http')
+            command.add_argument('--workers', type=int, default=4)
+            command.add_argument('--requests-per-second', type=float, default=1 / 10)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    store = ResultsStore(args.store)
+    scheduler = RecrawlScheduler(store)
+    try:
+        if args.command == 'add':
+            added = scheduler.add(scrape.read_urls(args.file), args.weight)
+            print(f"📥 {added} new URLs tracked ({len(scheduler)} in total)")
+        elif args.command == 'plan':
+            planned = scheduler.plan(args.budget)
+            for value, url in planned:
+                print(f"{value:.3f}  {url}")
+            print(f"\n📋 {len(planned)} of {len(scheduler)} URLs due, "
+                  f"expected value {sum(value for value, _ in planned):.2f}")
+        else:
+            backend = importlib.import_module(scrape.BACKENDS[args.backend])
+            options = {'requests_per_second': args.requests_per_second}
+            if args.backend != 'browser':
+                options['max_workers'] = args.workers
+            if args.backend in RETRYING_BACKENDS:
+                options['retry_policy'] = single_attempt_policy()
+            summary = scheduler.run(backend.iter_attractions, args.budget,
+                                    args.max_minutes * 60 if args.max_minutes else None, **options)
+            print(f"\n🔄 Refetched {summary['fetched']}/{summary['planned']} planned URLs: "
+                  f"{summary['succeeded']} succeeded, {summary['changed']} durations changed "
+                  f"(expected value {summary['value']})")
+    finally:
+        scheduler.close()
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Streaming result sinks
+
+Incremental writers for scrape results so a crawl never has to hold every
+result in memory or rewrite the output file at the end. CSV and JSONL
+sinks append and flush every flush_every records (other processes can
+tail the file while the crawl runs); the Parquet sink writes one row group
+per batch.
+"""
+
+import csv
+import json
+import os
+
+from metrics import METRICS
+from results_store import CSV_FIELDS
+
+
+class ResultSink:
+    """
+    Base class: write() buffers a result, flush() makes buffered results
+    durable, close() flushes and releases the file
+    """
+
+    def __init__(self, path, flush_every=50):
+        self.path = path
+        self.flush_every = flush_every
+        self.count = 0
+        self._unflushed = 0
+
+    def write(self, result):
+        with METRICS.timer('write'):
+            self._write(result)
+            self.count += 1
+            self._unflushed += 1
+            if self._unflushed >= self.flush_every:
+                self.flush()
+
+    def _write(self, result):
+        raise NotImplementedError
+
+    def flush(self):
+        self._unflushed = 0
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CsvSink(ResultSink):
+    """
+    Appends rows to a CSV file, writing the header only for a new file
+    """
+
+    def __init__(self, path, flush_every=50, fieldnames=CSV_FIELDS):
+        super().__init__(path, flush_every)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'a', newline='', encoding='utf-8-sig' if new_file else 'utf-8')
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, extrasaction='ignore')
+        if new_file:
+            self._writer.writeheader()
+
+    def _write(self, result):
+        self._writer.writerow(result)
+
+    def flush(self):
+        self._file.flush()
+        super().flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class JsonlSink(ResultSink):
+    """
+    Appends one JSON object per line
+    """
+
+    def __init__(self, path, flush_every=50):
+        super().__init__(path, flush_every)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _write(self, result):
+        self._file.write(json.dumps(result, ensure_ascii=False))
+        self._file.write('\n')
+
+    def flush(self):
+        self._file.flush()
+        super().flush()
+
+    def close(self):
+        super().close()
+        self._file.close()
+
+
+class ParquetSink(ResultSink):
+    """
+    Buffers flush_every results and writes them as one Parquet row group.
+    Needs pyarrow.
+    """
+
+    def __init__(self, path, flush_every=1000, fieldnames=CSV_FIELDS):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ImportError("Parquet output needs the 'pyarrow' package (pip install pyarrow)")
+        super().__init__(path, flush_every)
+        self._pa = pyarrow
+        self.fieldnames = fieldnames
+        types = {'success': pyarrow.bool_()}
+        self._schema = pyarrow.schema([(name, types.get(name, pyarrow.string())) for name in fieldnames])
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+        self._buffer = []
+
+    def _write(self, result):
+        self._buffer.append(result)
+
+    def flush(self):
+        if self._buffer:
+            columns = {name: [row.get(name) for row in self._buffer] for name in self.fieldnames}
+            self._writer.write_table(self._pa.Table.from_pydict(columns, schema=self._schema))
+            self._buffer = []
+        super().flush()
+
+    def close(self):
+        super().close()
+        self._writer.close()
+
+
+SINKS = {
+    '.csv': CsvSink,
+    '.jsonl': JsonlSink,
+    '.parquet': ParquetSink,
+}
+
+
+def open_sink(path, **kwargs):
+    """
+    Pick a sink from the file extension (.csv, .jsonl or .parquet)
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in SINKS:
+        raise ValueError(f"No result sink for '{extension}' files")
+    return SINKS[extension](path, **kwargs)
+
+
+def write_results(results, sink):
+    """
+    Drain a result iterator into a sink, return how many were written
+    """
+    written = 0
+    for result in results:
+        sink.write(result)
+        written += 1
+    sink.flush()
+    return written
@@ -0,0 +1,133 @@
+"""
+SQLite-backed results store
+
+Every result is committed as soon as it arrives, keyed by the TripAdvisor
+d-id (or the URL when there is none), together with attempt counts and
+timestamps. A crash or Ctrl-C loses at most the page in flight, and a
+re-run can skip URLs that already succeeded. CSV files are exported from
+the store instead of being written once at the end of the run.
+"""
+
+import csv
+import sqlite3
+import threading
+import time
+
+from metrics import METRICS
+from tripadvisor_urls import attraction_key, parse_attraction_url
+
+CSV_FIELDS = ['name', 'url', 'duration', 'success']
+
+
+class ResultsStore:
+    """
+    path: SQLite database file
+    """
+
+    def __init__(self, path='scrape_results.sqlite'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                geo_id INTEGER,
+                location_id INTEGER,
+                name TEXT,
+                duration TEXT,
+                success INTEGER NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                first_attempt_at REAL NOT NULL,
+                last_attempt_at REAL NOT NULL,
+                succeeded_at REAL
+            )
+            """
+        )
+        self._db.commit()
+
+    def record(self, result):
+        """
+        Upsert one scrape result and commit it straight away.
+        A failed attempt never overwrites an earlier success.
+        """
+        url = result['url']
+        parsed = parse_attraction_url(url) or (None, None)
+        now = time.time()
+        success = 1 if result['success'] else 0
+        with self._lock, METRICS.timer('write'):
+            self._db.execute(
+                """
+                INSERT INTO results
+                    (key, url, geo_id, location_id, name, duration, success,
+                     attempts, first_attempt_at, last_attempt_at, succeeded_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET
+                    attempts = attempts + 1,
+                    last_attempt_at = excluded.last_attempt_at,
+                    url = CASE WHEN excluded.success OR NOT success THEN excluded.url ELSE url END,
+                    name = CASE WHEN excluded.success OR NOT success THEN excluded.name ELSE name END,
+                    duration = CASE WHEN excluded.success OR NOT success THEN excluded.duration ELSE duration END,
+                    succeeded_at = CASE WHEN excluded.success THEN excluded.succeeded_at ELSE succeeded_at END,
+                    success = MAX(success, excluded.success)
+                """,
+                (attraction_key(url), url, parsed[0], parsed[1], result['name'], result['duration'],
+                 success, now, now, now if success else None),
+            )
+            self._db.commit()
+
+    def has_succeeded(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT success FROM results WHERE key = ?", (attraction_key(url),)
+            ).fetchone()
+        return bool(row and row[0])
+
+    def pending(self, urls):
+        """
+        Lazily yield the URLs from urls that have not succeeded yet (resume support)
+        """
+        with self._lock:
+            done = {key for (key,) in self._db.execute("SELECT key FROM results WHERE success = 1")}
+        return (url for url in urls if attraction_key(url) not in done)
+
+    def rows(self):
+        """
+        Result dicts in the order attractions were first attempted
+        """
+        with self._lock:
+            cursor = self._db.execute(
+                "SELECT name, url, duration, success FROM results ORDER BY first_attempt_at"
+            )
+        while True:
+            # Page through the table so exports of large crawls stay flat in memory
+            with self._lock:
+                batch = cursor.fetchmany(500)
+            if not batch:
+                break
+            for name, url, duration, success in batch:
+                yield {'name': name, 'url': url, 'duration': duration, 'success': bool(success)}
+
+    def attempts(self, url):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT attempts FROM results WHERE key = ?", (attraction_key(url),)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def export_csv(results, filename):
+    """
+    Write results (a list of result dicts or a ResultsStore) to CSV
+    """
+    rows = results.rows() if isinstance(results, ResultsStore) else results
+    with open(filename, 'w', newline='', encoding='utf-8-sig') as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
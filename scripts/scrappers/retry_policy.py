@@ -0,0 +1,117 @@
+"""
+Retry policy for failed fetches
+
+Failures are classified as transient (403 blocks, 408, 425, 429, 5xx,
+timeouts, dropped connections) or permanent (404, 410 and other 4xx). Transient
+failures are retried after an exponential backoff with jitter, unless the
+server sent Retry-After, which always wins. fetch_engine puts the URL on a
+delay queue in the meantime so other URLs keep being processed.
+"""
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+
+class RetryableError(Exception):
+    """
+    Raised by a scrape function for a failure worth retrying later
+    status: HTTP status, or None for timeouts / connection errors
+    retry_after: seconds the server asked us to wait, if any
+    """
+
+    def __init__(self, url, status=None, retry_after=None, message=''):
+        super().__init__(message or f"{status or 'network error'} for url: {url}")
+        self.url = url
+        self.status = status
+        self.retry_after = retry_after
+
+
+# Per status class: how many attempts in total and the first backoff delay
+DEFAULT_RULES = {
+    '403': {'max_attempts': 4, 'base_delay': 10},
+    '408': {'max_attempts': 3, 'base_delay': 5},
+    '425': {'max_attempts': 3, 'base_delay': 5},
+    '429': {'max_attempts': 6, 'base_delay': 30},
+    '503': {'max_attempts': 5, 'base_delay': 15},
+    '5xx': {'max_attempts': 3, 'base_delay': 10},
+    'network': {'max_attempts': 3, 'base_delay': 5},
+}
+
+PERMANENT_STATUSES = frozenset([400, 401, 404, 405, 410, 451])
+
+
+def status_class(status):
+    """
+    Key into the rules table: the exact code when it has its own rule,
+    otherwise '5xx' / '4xx', or 'network' when there was no response
+    """
+    if status is None:
+        return 'network'
+    if str(status) in DEFAULT_RULES:
+        return str(status)
+    return f"{status // 100}xx"
+
+
+def is_transient(status):
+    if status is None:
+        return True
+    if status in PERMANENT_STATUSES:
+        return False
+    return status in (403, 408, 425, 429) or status >= 500
+
+
+def parse_retry_after(value):
+    """
+    Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    rules: per status class overrides of DEFAULT_RULES
+    max_delay: cap on any single backoff (Retry-After is capped too)
+    jitter: +/- fraction of randomness applied to backoff delays
+    """
+
+    def __init__(self, rules=None, max_delay=600, jitter=0.5):
+        self.rules = {key: dict(value) for key, value in DEFAULT_RULES.items()}
+        for key, value in (rules or {}).items():
+            self.rules.setdefault(key, {'max_attempts': 1, 'base_delay': 0}).update(value)
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def _rule(self, status):
+        return self.rules.get(status_class(status), {'max_attempts': 1, 'base_delay': 0})
+
+    def next_delay(self, error, attempt):
+        """
+        Seconds to wait before retrying after the attempt-th failure
+        (attempt starts at 1), or None when the URL should be given up
+        """
+        if not is_transient(error.status):
+            return None
+        rule = self._rule(error.status)
+        if attempt >= rule['max_attempts']:
+            return None
+        if error.retry_after is not None:
+            return min(error.retry_after, self.max_delay)
+        delay = min(rule['base_delay'] * 2 ** (attempt - 1), self.max_delay)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+def single_attempt_policy():
+    """
+    RetryPolicy that gives every failure up after one attempt, for callers
+    that count requests (failures still come back as results)
+    """
+    return RetryPolicy({key: {'max_attempts': 1} for key in DEFAULT_RULES})
@@ -0,0 +1,168 @@
+"""
+Per-site statistics of which extraction rule wins
+
+Records which rule produced the duration for every page, grouped by domain
+and page template (the 'Attraction_Review' part of the path), and keeps
+the statistics in a JSON file between runs. Once one rule clearly
+dominates a template, pages are first parsed with only that rule and the
+rules that outrank it; the rules below it and the full-text fallback only
+run when that misses. Rule priority always decides which rule wins a page,
+so the statistics never change what is extracted, only how much work it
+takes. A sudden fall in the dominant rule's recent success rate is
+reported as layout drift.
+"""
+
+import json
+import logging
+import os
+import threading
+from collections import deque
+from urllib.parse import urlsplit
+
+from duration_extractor import extract_duration, extract_from_chunks, FULL_RULES
+from metrics import METRICS
+
+log = logging.getLogger(__name__)
+
+STRUCTURED_RULES = ('json-ld', 'embedded-state')
+
+
+def template_key(url):
+    """
+    'www.tripadvisor.com/Attraction_Review' for an attraction page
+    """
+    parts = urlsplit(url)
+    first_segment = parts.path.strip('/').split('/')[0]
+    return f"{parts.netloc}/{first_segment.split('-')[0]}"
+
+
+class RuleRegistry:
+    """
+    path: JSON file the statistics are loaded from and saved to
+    warmup: pages seen for a template before a single rule may be preferred
+    min_hit_rate: share of pages a rule must win to get a narrow pass
+    drift_window: recent pages used to detect layout drift
+    drift_drop: fall in hit rate (vs. the long-run rate) reported as drift
+    """
+
+    def __init__(self, path='rule_stats.json', warmup=20, min_hit_rate=0.9,
+                 drift_window=50, drift_drop=0.3):
+        self.path = path
+        self.warmup = warmup
+        self.min_hit_rate = min_hit_rate
+        self.drift_window = drift_window
+        self.drift_drop = drift_drop
+        self.drift_events = []
+        self._lock = threading.Lock()
+        self._stats = {}
+        self._recent = {}
+        if path and os.path.exists(path):
+            with open(path, encoding='utf-8') as f:
+                self._stats = json.load(f)
+
+    def _template(self, url):
+        key = template_key(url)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = {'pages': 0, 'misses': 0, 'hits': {}}
+        return key, stats
+
+    def preferred_rule(self, url):
+        """
+        The rule that wins almost every page of this template, once warmed up
+        """
+        with self._lock:
+            _, stats = self._template(url)
+            if stats['pages'] < self.warmup or not stats['hits']:
+                return None
+            rule_id, hits = max(stats['hits'].items(), key=lambda item: item[1])
+            if hits / stats['pages'] < self.min_hit_rate:
+                return None
+            return rule_id
+
+    def record(self, url, rule_id):
+        """
+        Count the rule that produced this page's duration (None for a miss)
+        """
+        with self._lock:
+            key, stats = self._template(url)
+            leader = max(stats['hits'].items(), key=lambda item: item[1])[0] if stats['hits'] else None
+            leader_rate = stats['hits'].get(leader, 0) / stats['pages'] if stats['pages'] else 0
+
+            stats['pages'] += 1
+            if rule_id is None:
+                stats['misses'] += 1
+            else:
+                stats['hits'][rule_id] = stats['hits'].get(rule_id, 0) + 1
+
+            if leader is None or stats['pages'] < self.warmup:
+                return
+            recent = self._recent.get(key)
+            if recent is None:
+                recent = self._recent[key] = deque(maxlen=self.drift_window)
+            recent.append(rule_id == leader)
+            if len(recent) == self.drift_window:
+                recent_rate = sum(recent) / len(recent)
+                if leader_rate - recent_rate >= self.drift_drop:
+                    event = {'template': key, 'rule': leader,
+                             'long_run_rate': round(leader_rate, 3), 'recent_rate': round(recent_rate, 3)}
+                    self.drift_events.append(event)
+                    log.warning("  🚨 Layout drift on %s: '%s' hit rate fell from %.0f%% to %.0f%%",
+                                key, leader, leader_rate * 100, recent_rate * 100)
+                    recent.clear()
+
+    def save(self):
+        with self._lock:
+            tmp_path = self.path + '.tmp'
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._stats, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.path)
+
+
+def adaptive_extract(html, url, registry=None, rules=FULL_RULES, full_text_fallback=False,
+                     default_name='Unknown attraction'):
+    """
+    extract_duration guided by a RuleRegistry: a narrow pass with the
+    template's dominant rule and the rules ahead of it in rules comes
+    first, then the full rule set. A match in the narrow pass cannot be
+    outranked by the rules it leaves out, and structured data keeps its
+    precedence, so the result is the same as without a registry. A narrow
+    miss costs a second DOM parse but not a second structured-data scan.
+    Without a registry this is plain extract_duration.
+    """
+    if registry is None:
+        return _counted(extract_duration(html, rules, full_text_fallback, default_name))
+
+    structured = True
+    preferred = registry.preferred_rule(url)
+    if preferred is not None and preferred not in STRUCTURED_RULES:
+        rule_ids = [rule.rule_id for rule in rules]
+        if preferred in rule_ids:
+            narrow = rules[:rule_ids.index(preferred) + 1]
+            result = extract_duration(html, narrow, default_name=default_name)
+            if result['success']:
+                registry.record(url, result['rule'])
+                return _counted(result)
+            # The structured data had no duration, no need to scan it again
+            structured = False
+
+    result = extract_duration(html, rules, full_text_fallback, default_name, structured=structured)
+    registry.record(url, result['rule'])
+    return _counted(result)
+
+
+def adaptive_extract_chunks(chunks, url, registry=None, rules=FULL_RULES, full_text_fallback=False,
+                            default_name='Unknown attraction'):
+    """
+    adaptive_extract for a streamed body. A stream can only be read once,
+    so there is no narrow pass; the winning rule is still recorded.
+    """
+    result = extract_from_chunks(chunks, rules, full_text_fallback, default_name)
+    if registry is not None:
+        registry.record(url, result['rule'])
+    return _counted(result)
+
+
+def _counted(result):
+    METRICS.count('extractions', method=result['rule'] or 'none')
+    return result
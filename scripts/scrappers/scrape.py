@@ -0,0 +1,180 @@
+"""
+One entry point for every scraper backend
+
+Only the standard library is imported up front; the selected backend (and
+with it requests or selenium) is imported once the arguments are parsed,
+so a cron job or pool worker that only needs the HTTP scraper never pays
+for selenium, and --help is instant. Browser backends take the
+chromedriver path from driver_path's cache (--offline never touches the
+network). The time from start to ready is printed with every run.
+Usage:
+    python3 scrape.py URL [URL ...]
+    python3 scrape.py --urls-file urls.txt --backend tiered --output results.csv
+    python3 scrape.py --geo 189852 --city Stockholm_Stockholm_County --store stockholm_attractions.sqlite
+    python3 scrape.py --backend browser --offline --startup-only
+"""
+
+import time
+
+_STARTED = time.perf_counter()
+
+import argparse
+import importlib
+import logging
+import sys
+
+log = logging.getLogger(__name__)
+
+# backend name -> module with iter_attractions(urls, **options)
+BACKENDS = {
+    'http': 'scraper2',
+    'basic': 'tripadvisor_scraper',
+    'browser': 'selenium_scraper',
+    'tiered': 'tiered_scraper',
+}
+BROWSER_BACKENDS = ('browser', 'tiered')
+
+
+def _ms(seconds):
+    return f"{seconds * 1000:.0f} ms"
+
+
+def read_urls(path):
+    """
+    URLs from a file, one per line; blank lines and # comments are skipped
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+
+def backend_options(args, driver_path=None):
+    """
+    Keyword arguments for the selected backend's iter_attractions
+    """
+    options = {'requests_per_second': args.requests_per_second}
+    if args.backend != 'browser':
+        options['max_workers'] = args.workers
+    if args.backend in ('http', 'browser', 'tiered'):
+        options['jitter'] = args.jitter
+    if args.backend == 'http':
+        options['stream'] = args.stream
+    if args.backend in BROWSER_BACKENDS:
+        options.update(headless=not args.show_browser, lean=not args.full_render, pool_size=args.pool_size,
+                       driver_path=driver_path, offline=args.offline, capture_network=args.capture_network)
+    return options
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Scrape TripAdvisor visit durations')
+    parser.add_argument('urls', nargs='*', help='attraction URLs')
+    parser.add_argument('--urls-file', help='file with one attraction URL per line')
+    parser.add_argument('--geo', type=int, help='discover every attraction of a geo id (e.g. 189852)')
+    parser.add_argument('--city', default='', help='city slug for --geo listing URLs')
+    parser.add_argument('--max-pages', type=int, help='listing pages to read for --geo')
+    parser.add_argument('--base-url', help='site to discover on, e.g. a mock_tripadvisor server')
+    parser.add_argument('--backend', choices=sorted(BACKENDS), default='http')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent HTTP fetches')
+    parser.add_argument('--requests-per-second', type=float, default=1 / 10, help='per-host budget')
+    parser.add_argument('--jitter', type=float, default=5, help='random extra wait in seconds')
+    parser.add_argument('--stream', action='store_true', help='http: stop reading pages once the duration is in')
+    parser.add_argument('--pool-size', type=int, default=1, help='browsers rendering at once')
+    parser.add_argument('--show-browser', action='store_true', help='open a browser window (not headless)')
+    parser.add_argument('--full-render', action='store_true', help='load images and fonts too')
+    parser.add_argument('--capture-network', action='store_true',
+                        help='browser: read durations from the JSON the page loads')
+    parser.add_argument('--offline', action='store_true', help='only use a cached or local chromedriver')
+    parser.add_argument('--refresh-driver', action='store_true', help='resolve chromedriver again')
+    parser.add_argument('--cache', metavar='DIR', help='HttpCache directory')
+    parser.add_argument('--store', metavar='SQLITE', help='ResultsStore to record into (enables resume)')
+    parser.add_argument('--output', help='write results to a .csv, .jsonl or .parquet file')
+    parser.add_argument('--metrics', action='store_true', help='write scrape_metrics.json / .prom at the end')
+    parser.add_argument('--startup-only', action='store_true', help='report the startup time and exit')
+    parser.add_argument('-v', '--verbose', action='store_true', help='log every URL')
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format='%(message)s')
+
+    # Startup: backend import, then the chromedriver path when a browser is certain
+    import_start = time.perf_counter()
+    backend = importlib.import_module(BACKENDS[args.backend])
+    import_seconds = time.perf_counter() - import_start
+
+    driver_seconds = 0.0
+    driver_path = None
+    if args.backend == 'browser' or (args.backend == 'tiered' and args.refresh_driver):
+        from driver_path import resolve_driver_path
+        driver_start = time.perf_counter()
+        driver_path = resolve_driver_path(offline=args.offline, refresh=args.refresh_driver)
+        driver_seconds = time.perf_counter() - driver_start
+
+    from metrics import METRICS
+    ready = time.perf_counter() - _STARTED
+    METRICS.observe('startup', ready)
+    report = f"⚡ Ready in {_ms(ready)} ({args.backend}: import {_ms(import_seconds)}"
+    if args.backend in BROWSER_BACKENDS:
+        report += f", chromedriver {_ms(driver_seconds)}"
+    print(report + ")")
+    if args.startup_only:
+        return 0
+
+    options = backend_options(args, driver_path)
+    if args.geo is not None:
+        import discovery
+        from fetch_engine import HostRateLimiter
+        # Listing pages and attraction pages draw on one per-host budget
+        rate_limiter = options['rate_limiter'] = HostRateLimiter(args.requests_per_second, jitter=args.jitter)
+        urls = discovery.stream_in_background(discovery.discover_attractions(
+            args.geo, args.city, base_url=args.base_url or discovery.BASE_URL, max_workers=args.workers,
+            max_pages=args.max_pages, rate_limiter=rate_limiter,
+        ))
+    elif args.urls_file:
+        urls = read_urls(args.urls_file)
+    elif args.urls:
+        urls = args.urls
+    else:
+        print("❌ No URLs: pass them as arguments, with --urls-file or with --geo")
+        return 2
+
+    if args.cache:
+        from http_cache import HttpCache
+        options['cache'] = HttpCache(args.cache)
+    store = None
+    if args.store:
+        from results_store import ResultsStore
+        store = options['store'] = ResultsStore(args.store)
+    sink = None
+    if args.output:
+        from result_sinks import open_sink
+        sink = open_sink(args.output)
+
+    scraped = succeeded = 0
+    try:
+        for result in backend.iter_attractions(urls, **options):
+            scraped += 1
+            succeeded += result['success']
+            status = "✅" if result['success'] else "❌"
+            log.debug("%d. %s %s: %s", scraped, status, result['name'], result['duration'])
+            if sink is not None:
+                sink.write(result)
+    finally:
+        if sink is not None:
+            sink.close()
+        if store is not None:
+            store.close()
+        if args.metrics:
+            METRICS.write_report()
+
+    print(f"\n📈 {succeeded}/{scraped} attractions with a visit duration")
+    if args.output:
+        print(f"💾 Data saved to: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
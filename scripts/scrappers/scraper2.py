@@ -3,27 +3,46 @@ Test TripAdvisor Scraper with Stockholm Attractions (Anti-blocking version)
 Usage: python3 test_stockholm_scraper.py
 """
 
+import logging
 import requests
-from bs4 import BeautifulSoup
-import re
-import csv
-import time
 import random
-
-def scrape_visit_duration(url, retry_count=0, max_retries=3):
+from functools import partial
+from http_cache import StreamingBody, cached_get
+from duration_extractor import FULL_RULES
+from rule_registry import adaptive_extract, adaptive_extract_chunks
+from results_store import ResultsStore, export_csv
+from retry_policy import RetryPolicy, RetryableError, is_transient, parse_retry_after
+from fetch_engine import HostRateLimiter, scrape_in_order
+from metrics import METRICS
+
+log = logging.getLogger(__name__)
+
+BROWSER_USER_AGENTS = [
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+]
+
+# Streaming mode stops reading a page after this many bytes
+MAX_BODY_BYTES = 5 * 1024 * 1024
+
+# Failures of a connection that may succeed on the next attempt, whether
+# they hit while waiting for the headers or while reading the body
+TRANSIENT_ERRORS = (requests.exceptions.Timeout, requests.exceptions.ConnectionError,
+                    requests.exceptions.ChunkedEncodingError)
+
+def fetch_page(url, cache=None, rate_limiter=None, retry_policy=None, stream=False):
     """
-    Scrape visit duration from attraction page with anti-blocking measures
+    Fetch an attraction page with anti-blocking headers and return the response
+    Raises RetryableError for transient failures when retry_policy is given,
+    requests exceptions otherwise
+    stream: return once the headers are in, leaving the body to be read
+    with StreamingBody (the caller closes the response)
     """
     # More realistic browser headers
-    user_agents = [
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.1 Safari/605.1.15',
-        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-        'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
-    ]
-
     headers = {
-        'User-Agent': random.choice(user_agents),
+        'User-Agent': random.choice(BROWSER_USER_AGENTS),
         'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8',
         'Accept-Language': 'en-US,en;q=0.9',
         'Accept-Encoding': 'gzip, deflate, br',
@@ -36,161 +55,244 @@ def scrape_visit_duration(url, retry_count=0, max_retries=3):
         'DNT': '1'
     }
 
-    try:
-        print(f"Accessing: {url}")
-
-        # Add random delay before request
-        time.sleep(random.uniform(2, 5))
+    log.debug("Accessing: %s", url)
 
+    try:
         # Use session for better connection handling
         session = requests.Session()
-        response = session.get(url, headers=headers, timeout=15)
-
-        # Check status
-        if response.status_code == 403:
-            if retry_count < max_retries:
-                wait_time = (retry_count + 1) * 10
-                print(f"  ⚠️  Blocked (403). Waiting {wait_time}s before retry {retry_count + 1}/{max_retries}...")
-                time.sleep(wait_time)
-                return scrape_visit_duration(url, retry_count + 1, max_retries)
-            else:
-                raise requests.exceptions.HTTPError(f"403 Forbidden after {max_retries} retries")
-
-        response.raise_for_status()
-
-        # HTML parsing
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # Save HTML for debugging
-        if retry_count == 0:
-            with open('debug_page.html', 'w', encoding='utf-8') as f:
-                f.write(soup.prettify())
-            print("  💾 Saved HTML to debug_page.html for inspection")
-
-        # Method 1: Search for duration elements
-        duration = None
-
-        # Try various selectors
-        possible_selectors = [
-            {'data-test-target': 'duration'},
-            {'class': 'duration'},
-            {'class': re.compile('duration', re.I)},
-            {'data-automation': 'WebPresentation_PoiDuration'}
-        ]
-
-        for selector in possible_selectors:
-            element = soup.find('div', selector)
-            if not element:
-                element = soup.find('span', selector)
-            if element:
-                duration = element.get_text(strip=True)
-                print(f"  ✓ Found duration with selector: {selector}")
-                break
-
-        # Method 2: Search for keywords in text
-        if not duration:
-            keywords = ['Duration', 'Suggested duration', 'length of visit']
-            for keyword in keywords:
-                elements = soup.find_all(text=re.compile(keyword, re.I))
-                for element in elements:
-                    parent = element.find_parent()
-                    if parent:
-                        text = parent.get_text(strip=True)
-                        # Extract time patterns
-                        time_match = re.search(r'(\d+[-–]\d+|\d+)\s*(hour|hr|minute|min)s?', text, re.I)
-                        if time_match:
-                            duration = time_match.group(0)
-                            print(f"  ✓ Found duration with keyword: {keyword}")
-                            break
-                if duration:
-                    break
-
-        # Method 3: Look for structured data
-        if not duration:
-            script_tags = soup.find_all('script', type='application/ld+json')
-            for script in script_tags:
-                try:
-                    import json
-                    data = json.loads(script.string)
-                    if isinstance(data, dict) and 'duration' in str(data).lower():
-                        print(f"  ℹ️  Found JSON-LD data (check debug_page.html)")
-                except:
-                    pass
-
-        # Extract attraction name
-        title = soup.find('h1')
-        attraction_name = title.get_text(strip=True) if title else "Unknown attraction"
-
-        return {
-            'name': attraction_name,
-            'url': url,
-            'duration': duration if duration else 'No visit duration data found',
-            'success': bool(duration)
-        }
+        response = cached_get(session, url, cache, headers=headers, timeout=15, rate_limiter=rate_limiter,
+                              stream=stream)
+    except TRANSIENT_ERRORS as e:
+        if retry_policy is None:
+            raise
+        log.debug("  ⚠️  %s, handing back for retry", e)
+        raise RetryableError(url, message=f"Request failed: {e}")
+
+    # Check status: blocks and overload go back to the retry scheduler
+    # (honouring Retry-After) rather than blocking this worker
+    status = response.status_code
+    if stream and status >= 400:
+        # The error page body is never read
+        response.close()
+    if retry_policy is not None and status >= 400 and is_transient(status):
+        log.debug("  ⚠️  Got %d, handing back for retry", status)
+        raise RetryableError(url, status, parse_retry_after(response.headers.get('Retry-After')),
+                             f"{status} Error for url: {url}")
+
+    response.raise_for_status()
+    return response
+
+def scrape_visit_duration(url, cache=None, rate_limiter=None, capture_store=None, retry_policy=None,
+                          rule_registry=None, stream=False, max_body_bytes=MAX_BODY_BYTES):
+    """
+    Scrape visit duration from attraction page with anti-blocking measures
+    cache: optional HttpCache, fresh pages are served from disk and stale
+    ones are revalidated with a conditional GET
+    rate_limiter: optional HostRateLimiter, skipped for cache hits
+    capture_store: optional CaptureStore that keeps the raw page
+    retry_policy: when given, transient failures (403/429/5xx, timeouts)
+    raise RetryableError so the caller can retry the URL later instead of
+    this function sleeping; without it they are returned as failures
+    rule_registry: optional RuleRegistry that narrows the rules to a dominant one first
+    stream: read the body in chunks and close the connection as soon as the
+    name and duration are found, reading at most max_body_bytes. Only bodies
+    read to the end are cached, so a stream that stops early (the usual
+    case) never fills the cache; it still serves and revalidates pages
+    cached by a non-streaming run
+    """
+    try:
+        if stream:
+            return scrape_streaming(url, cache, rate_limiter, capture_store, retry_policy,
+                                    rule_registry, max_body_bytes)
+
+        response = fetch_page(url, cache, rate_limiter, retry_policy)
+
+        # Keep the raw page for debugging (off unless a store is given)
+        if capture_store is not None:
+            capture_store.capture(url, response.content, {
+                'status': response.status_code,
+                'from_cache': getattr(response, 'from_cache', False),
+                'content_type': response.headers.get('Content-Type'),
+            })
+
+        # Single pass over the page: selector rules, keyword rules and the
+        # h1 name are evaluated together, parsing stops once both are found
+        extracted = adaptive_extract(response.content, url, rule_registry, FULL_RULES)
+        return page_result(url, extracted)
 
     except requests.exceptions.HTTPError as e:
-        print(f"  ✗ HTTP Error: {e}")
-        return {
-            'name': 'Request failed',
-            'url': url,
-            'duration': f'HTTP Error: {str(e)}',
-            'success': False
-        }
+        return http_failed(url, e)
     except requests.exceptions.RequestException as e:
-        print(f"  ✗ Request failed: {e}")
-        return {
-            'name': 'Request failed',
-            'url': url,
-            'duration': f'Request failed: {str(e)}',
-            'success': False
-        }
+        return request_failed(url, e)
+    except RetryableError:
+        raise
     except Exception as e:
-        print(f"  ✗ Parsing failed: {e}")
-        return {
-            'name': 'Error',
-            'url': url,
-            'duration': f'Parse failed: {str(e)}',
-            'success': False
-        }
+        return parse_failed(url, e)
 
-def scrape_multiple_attractions(urls):
+def scrape_streaming(url, cache=None, rate_limiter=None, capture_store=None, retry_policy=None,
+                     rule_registry=None, max_body_bytes=MAX_BODY_BYTES):
+    """
+    Streaming half of scrape_visit_duration: the body goes chunk by chunk
+    into the parser and is only held in memory when it is captured or
+    cached (a page cut short is never cached)
+    A connection dropped or timed out mid-body raises RetryableError when
+    retry_policy is given, like the same failure before the headers
+    """
+    response = fetch_page(url, cache, rate_limiter, retry_policy, stream=True)
+    body = StreamingBody(response, max_body_bytes, keep=capture_store is not None, cache=cache, url=url)
+    try:
+        extracted = adaptive_extract_chunks(body, url, rule_registry, FULL_RULES)
+    except TRANSIENT_ERRORS as e:
+        if retry_policy is None:
+            raise
+        log.debug("  ⚠️  %s after %d bytes, handing back for retry", e, body.bytes_read)
+        raise RetryableError(url, message=f"Request failed: {e}")
+    finally:
+        body.close()
+
+    if body.truncated:
+        log.debug("  ✂️  Stopped reading at the %d byte limit", max_body_bytes)
+    elif not body.complete:
+        log.debug("  ⏹️  Found everything after %d bytes, connection closed", body.bytes_read)
+    if capture_store is not None:
+        capture_store.capture(url, body.body, {
+            'status': response.status_code,
+            'from_cache': getattr(response, 'from_cache', False),
+            'content_type': response.headers.get('Content-Type'),
+            'bytes_read': body.bytes_read,
+            'complete': body.complete,
+        })
+    return page_result(url, extracted)
+
+def page_result(url, extracted):
     """
-    Scrape multiple attractions with random delays
+    Result row for a fetched page from the extractor output
+    """
+    duration = extracted['duration']
+    if duration:
+        log.debug("  ✓ Found duration with rule: %s", extracted['rule'])
+    return {
+        'name': extracted['name'],
+        'url': url,
+        'duration': duration if duration else 'No visit duration data found',
+        'success': bool(duration)
+    }
+
+def parse_failed(url, e):
+    """
+    Result row for a page that could not be parsed
+    """
+    log.debug("  ✗ Parsing failed: %s", e)
+    return {
+        'name': 'Error',
+        'url': url,
+        'duration': f'Parse failed: {str(e)}',
+        'success': False
+    }
+
+def http_failed(url, e):
+    """
+    Result row for a request answered with an error status
+    """
+    log.debug("  ✗ HTTP Error: %s", e)
+    return {
+        'name': 'Request failed',
+        'url': url,
+        'duration': f'HTTP Error: {str(e)}',
+        'success': False
+    }
+
+def request_failed(url, e):
+    """
+    Result row for a request that failed without an HTTP status
+    """
+    log.debug("  ✗ Request failed: %s", e)
+    return {
+        'name': 'Request failed',
+        'url': url,
+        'duration': f'Request failed: {str(e)}',
+        'success': False
+    }
+
+def give_up(url, error):
+    """
+    Result row for a URL the retry policy stopped retrying
+    """
+    if error.status is None:
+        return request_failed(url, error)
+    return http_failed(url, error)
+
+def iter_attractions(urls, max_workers=4, requests_per_second=1/10, jitter=5, cache=None,
+                     capture_store=None, store=None, retry_policy=None, rule_registry=None,
+                     rate_limiter=None, stream=False, max_body_bytes=MAX_BODY_BYTES):
+    """
+    Scrape attractions concurrently, yielding each result in URL order as
+    soon as it is ready. urls can be any iterable and nothing is collected,
+    so memory stays flat however long the crawl is.
+    The per-host rate limit replaces the old 2-5s + 5-10s sleeps: the request
+    budget stays the same, but waiting on one page no longer blocks the others
+    cache: optional HttpCache shared by all workers
+    capture_store: optional CaptureStore for keeping every raw page
+    store: optional ResultsStore, each result is committed as soon as it
+    finishes (before it is put back in URL order) and URLs that already
+    succeeded are skipped, so an interrupted run resumes
+    retry_policy: RetryPolicy for transient failures (default: RetryPolicy()).
+    Failed URLs wait on a delay queue while the others keep being processed
+    rule_registry: optional RuleRegistry, saved when the run finishes
+    rate_limiter: HostRateLimiter shared with other crawlers of the same
+    host (e.g. discovery); replaces requests_per_second / jitter
+    stream / max_body_bytes: see scrape_visit_duration
+    """
+    if store is not None:
+        urls = store.pending(urls)
+    if retry_policy is None:
+        retry_policy = RetryPolicy()
+    if rate_limiter is None:
+        rate_limiter = HostRateLimiter(requests_per_second, jitter=jitter)
+    scrape = partial(scrape_visit_duration, cache=cache, rate_limiter=rate_limiter,
+                     capture_store=capture_store, retry_policy=retry_policy,
+                     rule_registry=rule_registry, stream=stream, max_body_bytes=max_body_bytes)
+
+    try:
+        for result in scrape_in_order(urls, scrape, max_workers, retry_policy=retry_policy, on_give_up=give_up,
+                                      on_result=store.record if store is not None else None):
+            METRICS.count('results', tier='http', success=result['success'])
+            yield result
+    finally:
+        if rule_registry is not None:
+            rule_registry.save()
+
+def scrape_multiple_attractions(urls, **options):
+    """
+    Scrape multiple attractions and return the results as a list
+    options: see iter_attractions
     """
     results = []
 
-    for i, url in enumerate(urls, 1):
-        print(f"\n{'='*60}")
-        print(f"Processing {i}/{len(urls)} attraction...")
-        print('='*60)
+    for i, result in enumerate(iter_attractions(urls, **options), 1):
+        log.debug("Processed %d attractions", i)
 
-        result = scrape_visit_duration(url)
         results.append(result)
 
-        print(f"\n📍 Attraction: {result['name']}")
-        print(f"⏱️  Duration: {result['duration']}")
-
-        # Random wait between requests
-        if i < len(urls):
-            wait_time = random.uniform(5, 10)
-            print(f"\n⏳ Waiting {wait_time:.1f}s before next request...")
-            time.sleep(wait_time)
+        log.debug("📍 Attraction: %s", result['name'])
+        log.debug("⏱️  Duration: %s", result['duration'])
 
     return results
 
 def save_to_csv(results, filename='stockholm_attractions_duration.csv'):
     """
     Save results to CSV file
+    results: list of result dicts or a ResultsStore to export
     """
-    with open(filename, 'w', newline='', encoding='utf-8-sig') as file:
-        writer = csv.DictWriter(file, fieldnames=['name', 'url', 'duration', 'success'])
-        writer.writeheader()
-        writer.writerows(results)
+    export_csv(results, filename)
 
     print(f"\n💾 Data saved to: {filename}")
 
 # ===== TEST WITH STOCKHOLM ATTRACTIONS =====
 if __name__ == "__main__":
+    # Per-URL progress is logged at DEBUG; use logging.DEBUG to see it
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     print("=" * 60)
     print("🕷️  TripAdvisor Scraper - Stockholm Attractions")
     print("=" * 60)
@@ -206,11 +308,19 @@ if __name__ == "__main__":
 
     print(f"📊 Total attractions to scrape: {len(stockholm_urls)}\n")
 
+    # Results are committed one by one, so an interrupted run picks up
+    # where it stopped
+    store = ResultsStore('stockholm_attractions.sqlite')
+
     # Scrape all attractions
-    results = scrape_multiple_attractions(stockholm_urls)
+    # Stream each page and stop reading once the name and duration are in
+    scrape_multiple_attractions(stockholm_urls, store=store, stream=True)
 
-    # Save to CSV
-    save_to_csv(results, filename='stockholm_attractions_duration.csv')
+    # Export to CSV
+    save_to_csv(store, filename='stockholm_attractions_duration.csv')
+    METRICS.write_report()
+    print("📊 Stage timings and counters saved to scrape_metrics.json / scrape_metrics.prom")
+    results = list(store.rows())
 
     # Print summary
     print("\n" + "=" * 60)
@@ -232,7 +342,7 @@ if __name__ == "__main__":
         print("\n" + "=" * 60)
         print("🔍 TROUBLESHOOTING TIPS:")
         print("=" * 60)
-        print("1. Check debug_page.html to see what TripAdvisor returned")
+        print("1. Re-run with a CaptureStore to see what TripAdvisor returned")
         print("2. Try opening the URLs in your browser to verify they work")
         print("3. Consider using a VPN or proxy")
         print("4. Try the manual inspection method (see below)")
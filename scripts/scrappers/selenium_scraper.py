@@ -9,24 +9,71 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
+from selenium.common.exceptions import TimeoutException
+from functools import partial
+from driver_path import resolve_driver_path
+from duration_extractor import RENDERED_RULES
+from rule_registry import adaptive_extract
+from browser_pool import BrowserPool, is_driver_crash
+from results_store import ResultsStore, export_csv
+from fetch_engine import HostRateLimiter, in_order
+from metrics import METRICS
+from network_capture import NetworkCapture, enable_network_capture
+import logging
 import time
 import random
-import csv
-import re
 
-def setup_driver(headless=False):
+log = logging.getLogger(__name__)
+
+# Resources a lean render never downloads
+BLOCKED_URL_PATTERNS = [
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.avif', '*.svg', '*.ico',
+    '*.woff', '*.woff2', '*.ttf', '*.otf',
+    '*.mp4', '*.webm', '*.mp3', '*.m3u8',
+]
+
+# Elements that mean the page has rendered enough to extract from
+READY_LOCATORS = [
+    (By.CSS_SELECTOR, '[data-automation="WebPresentation_PoiDuration"]'),
+    (By.CSS_SELECTOR, '[data-test-target="duration"]'),
+    (By.CSS_SELECTOR, '[class*="duration"]'),
+    (By.TAG_NAME, 'h1'),
+]
+
+# Reads the heading without asking the browser for layout
+HEADING_SCRIPT = "const h1 = document.querySelector('h1'); return h1 ? h1.textContent.trim() : null;"
+
+def setup_driver(headless=False, lean=False, driver_path=None, offline=False, capture_network=False,
+                 page_load_timeout=30):
     """
     Setup Chrome WebDriver with options
     headless=True: Run without opening browser window
     headless=False: Open browser window (easier to debug)
+    lean=True: 'eager' page loads with images, media and fonts blocked
+    driver_path: chromedriver binary (default: the cached path from
+    driver_path.resolve_driver_path, resolved once)
+    offline: never look the driver up over the network
+    capture_network: keep Chrome's performance log for NetworkCapture
+    page_load_timeout: hard limit (seconds) for driver.get, so a page that
+    never finishes loading cannot hang a browser
     """
     chrome_options = Options()
 
+    if capture_network:
+        enable_network_capture(chrome_options)
+
     if headless:
         chrome_options.add_argument('--headless')
 
+    if lean:
+        # Return from driver.get at DOMContentLoaded instead of full load
+        chrome_options.page_load_strategy = 'eager'
+        chrome_options.add_argument('--blink-settings=imagesEnabled=false')
+        chrome_options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.managed_default_content_settings.media_stream': 2,
+        })
+
     # Anti-detection options
     chrome_options.add_argument('--disable-blink-features=AutomationControlled')
     chrome_options.add_argument('--no-sandbox')
@@ -40,129 +87,139 @@ def setup_driver(headless=False):
     chrome_options.add_experimental_option('useAutomationExtension', False)
 
     # Setup driver
-    service = Service(ChromeDriverManager().install())
+    service = Service(driver_path or resolve_driver_path(offline))
     driver = webdriver.Chrome(service=service, options=chrome_options)
+    driver.set_page_load_timeout(page_load_timeout)
 
     # Execute script to hide webdriver property
     driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
 
+    if lean:
+        # Fonts and media have no Chrome pref, block them at the network layer
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+
     return driver
 
-def scrape_visit_duration_selenium(driver, url):
+def wait_until_ready(driver, timeout=10):
+    """
+    Return as soon as the duration container or the h1 is in the DOM,
+    giving up after timeout seconds
+    """
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.2).until(
+            EC.any_of(*[EC.presence_of_element_located(locator) for locator in READY_LOCATORS])
+        )
+        return True
+    except TimeoutException:
+        log.debug("  ⚠️  Nothing to extract after %ss, continuing anyway...", timeout)
+        return False
+
+def scrape_visit_duration_selenium(driver, url, cache=None, lean=False, timeout=10, capture_store=None,
+                                   rule_registry=None, capture_network=False):
     """
     Scrape visit duration using Selenium
+    cache: optional HttpCache, a fresh rendered page is reused instead of
+    loading it in the browser again
+    lean: skip the fixed human-like sleeps and scrolling, waiting only until
+    the page has something to extract (pair with setup_driver(lean=True))
+    timeout: hard limit for the readiness wait (driver.get is bounded by
+    setup_driver's page_load_timeout)
+    capture_store: optional CaptureStore that keeps the rendered page
+    rule_registry: optional RuleRegistry that narrows the rules to a dominant one first
+    capture_network: read the duration from the JSON responses the page
+    loads (needs setup_driver(capture_network=True)); the DOM is only
+    extracted when none of them has it
     """
     try:
-        print(f"\n{'='*60}")
-        print(f"Accessing: {url}")
-        print('='*60)
-
-        # Load page
-        driver.get(url)
-
-        # Random human-like delay
-        time.sleep(random.uniform(3, 6))
-
-        # Wait for page to load
-        try:
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.TAG_NAME, "h1"))
-            )
-        except:
-            print("  ⚠️  Page load timeout, continuing anyway...")
-
-        # Scroll page (human-like behavior)
-        driver.execute_script("window.scrollTo(0, 500);")
-        time.sleep(1)
-        driver.execute_script("window.scrollTo(0, 0);")
-
-        # Get page source
-        page_source = driver.page_source
-        soup = BeautifulSoup(page_source, 'html.parser')
-
-        # Save HTML for debugging
-        with open('selenium_debug.html', 'w', encoding='utf-8') as f:
-            f.write(soup.prettify())
-        print("  💾 Saved HTML to selenium_debug.html")
-
-        # Extract attraction name
-        attraction_name = "Unknown attraction"
-        try:
-            title_element = driver.find_element(By.TAG_NAME, "h1")
-            attraction_name = title_element.text.strip()
-            print(f"  📍 Attraction: {attraction_name}")
-        except:
-            print("  ⚠️  Could not find attraction name")
-
-        # Method 1: Try to find duration with various selectors
-        duration = None
-
-        # Try different XPath patterns
-        xpath_patterns = [
-            "//div[contains(text(), 'Duration')]",
-            "//div[contains(text(), 'Suggested duration')]",
-            "//span[contains(text(), 'Duration')]",
-            "//*[contains(@class, 'duration')]",
-            "//*[contains(text(), 'hour') or contains(text(), 'hours')]",
-        ]
-
-        for xpath in xpath_patterns:
-            try:
-                elements = driver.find_elements(By.XPATH, xpath)
-                for element in elements:
-                    text = element.text.strip()
-                    if text and ('hour' in text.lower() or 'minute' in text.lower() or 'duration' in text.lower()):
-                        # Extract time pattern
-                        time_match = re.search(r'(\d+[-–]\d+|\d+)\s*(hour|hr|minute|min)s?', text, re.I)
-                        if time_match:
-                            duration = time_match.group(0)
-                            print(f"  ✅ Found duration: {duration}")
-                            print(f"  📝 Full text: {text}")
-                            break
-                if duration:
-                    break
-            except:
-                continue
-
-        # Method 2: Search in BeautifulSoup
-        if not duration:
-            print("  🔍 Trying BeautifulSoup search...")
-            keywords = ['Duration', 'Suggested duration', 'length of visit']
-            for keyword in keywords:
-                elements = soup.find_all(text=re.compile(keyword, re.I))
-                for element in elements:
-                    parent = element.find_parent()
-                    if parent:
-                        text = parent.get_text(strip=True)
-                        time_match = re.search(r'(\d+[-–]\d+|\d+)\s*(hour|hr|minute|min)s?', text, re.I)
-                        if time_match:
-                            duration = time_match.group(0)
-                            print(f"  ✅ Found duration: {duration}")
-                            break
-                if duration:
-                    break
-
-        # Method 3: Look for all text containing time patterns
-        if not duration:
-            print("  🔍 Searching all text for time patterns...")
-            all_text = soup.get_text()
-            # More flexible time pattern
-            time_patterns = [
-                r'(\d+[-–]\d+)\s*(hour|hr)s?',
-                r'(\d+)\s*to\s*(\d+)\s*(hour|hr)s?',
-                r'about\s*(\d+)\s*(hour|hr)s?',
-                r'(\d+)\s*(hour|hr)s?'
-            ]
-            for pattern in time_patterns:
-                matches = re.findall(pattern, all_text, re.I)
-                if matches:
-                    duration = ' '.join(matches[0]) if isinstance(matches[0], tuple) else matches[0]
-                    print(f"  ✅ Found duration pattern: {duration}")
-                    break
+        log.debug("Accessing: %s", url)
+
+        page_source = None
+        if cache is not None:
+            entry = cache.get(url)
+            if entry is not None and cache.is_fresh(entry):
+                page_source = entry['body'].decode('utf-8')
+                log.debug("  📦 Using cached render")
+
+        from_cache = page_source is not None
+        if not from_cache:
+            capture = NetworkCapture(driver) if capture_network else None
+            if capture is not None:
+                capture.reset()
+
+            # Load page; past the page load timeout, extract what has loaded
+            partial_load = False
+            with METRICS.timer('fetch'):
+                try:
+                    driver.get(url)
+                except TimeoutException:
+                    partial_load = True
+                    log.debug("  ⚠️  Page load timed out, using the partial page")
+                    METRICS.count('page_load_timeouts')
+                    driver.execute_script("window.stop();")
+
+            if capture is not None:
+                with METRICS.timer('network_capture'):
+                    captured = capture.wait_for_fields(timeout)
+                METRICS.count('network_captures', found=bool(captured['duration']))
+                if captured['duration']:
+                    # The JSON object holding the duration is often a tour or
+                    # product, so its name only stands in for a missing h1
+                    name = driver.execute_script(HEADING_SCRIPT) or captured['name'] or 'Unknown attraction'
+                    log.debug("  📍 Attraction: %s", name)
+                    log.debug("  ✅ Found duration (network, %d JSON responses): %s",
+                              capture.responses, captured['duration'])
+                    return {
+                        'name': name,
+                        'url': url,
+                        'duration': captured['duration'],
+                        'success': True
+                    }
+
+            if lean:
+                wait_until_ready(driver, timeout)
+            else:
+                # Random human-like delay
+                time.sleep(random.uniform(3, 6))
+
+                # Wait for page to load
+                try:
+                    WebDriverWait(driver, timeout).until(
+                        EC.presence_of_element_located((By.TAG_NAME, "h1"))
+                    )
+                except:
+                    log.debug("  ⚠️  Page load timeout, continuing anyway...")
+
+                # Scroll page (human-like behavior)
+                driver.execute_script("window.scrollTo(0, 500);")
+                time.sleep(1)
+                driver.execute_script("window.scrollTo(0, 0);")
+
+            # Get page source
+            page_source = driver.page_source
+            # A partial page is extracted from but not reused
+            if cache is not None and not partial_load:
+                cache.put(url, 200, page_source.encode('utf-8'), {'Content-Type': 'text/html; charset=utf-8'})
+
+        # Keep the rendered page for debugging (off unless a store is given)
+        if capture_store is not None:
+            capture_store.capture(url, page_source, {'from_cache': from_cache, 'lean': lean})
+
+        # Everything below works on the single page_source snapshot: the h1,
+        # the old XPath patterns, the keyword search and the full-text time
+        # patterns are evaluated offline in one pass, so no further WebDriver
+        # round trips are made for this page
+        extracted = adaptive_extract(page_source, url, rule_registry, RENDERED_RULES,
+                                     full_text_fallback=True)
+        attraction_name = extracted['name']
+        duration = extracted['duration']
+        log.debug("  📍 Attraction: %s", attraction_name)
+        if duration:
+            log.debug("  ✅ Found duration (%s): %s", extracted['rule'], duration)
 
         if not duration:
-            print("  ❌ No duration information found")
-            print("  💡 Check selenium_debug.html to manually find the duration")
+            log.debug("  ❌ No duration information found")
+            log.debug("  💡 Pass a CaptureStore to keep the page and find the duration manually")
 
         return {
             'name': attraction_name,
@@ -172,56 +229,96 @@ def scrape_visit_duration_selenium(driver, url):
         }
 
     except Exception as e:
-        print(f"  ❌ Error: {e}")
-        return {
-            'name': 'Error',
-            'url': url,
-            'duration': f'Error: {str(e)}',
-            'success': False
-        }
+        # A dead browser is the pool's problem: it restarts it and retries the URL
+        if is_driver_crash(e):
+            raise
+        return error_result(url, e)
 
-def scrape_multiple_attractions(urls, headless=False):
+def error_result(url, e):
     """
-    Scrape multiple attractions
+    Result row for a page that could not be scraped
     """
-    print("\n🚀 Starting browser...")
-    driver = setup_driver(headless=headless)
-    results = []
+    log.debug("  ❌ Error: %s", e)
+    return {
+        'name': 'Error',
+        'url': url,
+        'duration': f'Error: {str(e)}',
+        'success': False
+    }
+
+def iter_attractions(urls, headless=False, cache=None, pool_size=1,
+                     max_pages_per_driver=50, requests_per_second=1/10, jitter=5,
+                     lean=False, capture_store=None, store=None, rule_registry=None,
+                     driver_path=None, offline=False, capture_network=False, rate_limiter=None):
+    """
+    Scrape attractions on a browser pool, yielding each result in URL order
+    as soon as it is ready (urls can be any iterable)
+    cache: optional HttpCache for rendered pages
+    lean: block images/media/fonts and wait on page readiness instead of sleeps
+    capture_store: optional CaptureStore for keeping every rendered page
+    pool_size: number of browsers rendering at once
+    max_pages_per_driver: restart a browser after this many pages
+    requests_per_second / jitter: global rate limit shared by all browsers,
+    replacing the old 5-10s wait between pages
+    store: optional ResultsStore, each result is committed as it arrives and
+    URLs that already succeeded are skipped, so an interrupted run resumes
+    rule_registry: optional RuleRegistry, saved when the run finishes
+    driver_path / offline: see setup_driver
+    capture_network: take durations from the page's JSON responses first
+    rate_limiter: HostRateLimiter shared with other crawlers of the same
+    host (e.g. discovery); replaces requests_per_second / jitter
+    """
+    if store is not None:
+        urls = store.pending(urls)
+    print(f"\n🚀 Starting {pool_size} browser(s)...")
+    pool = BrowserPool(
+        partial(setup_driver, headless=headless, lean=lean, driver_path=driver_path, offline=offline,
+                capture_network=capture_network),
+        size=pool_size,
+        max_pages_per_driver=max_pages_per_driver,
+        rate_limiter=rate_limiter or HostRateLimiter(requests_per_second, jitter=jitter),
+    )
+    scrape = partial(scrape_visit_duration_selenium, cache=cache, lean=lean,
+                     capture_store=capture_store, rule_registry=rule_registry, capture_network=capture_network)
 
     try:
-        for i, url in enumerate(urls, 1):
-            print(f"\n{'='*60}")
-            print(f"Processing {i}/{len(urls)} attraction")
-            print('='*60)
+        for result in in_order(pool.run(urls, scrape, error_result),
+                               on_result=store.record if store is not None else None):
+            METRICS.count('results', tier='browser', success=result['success'])
+            yield result
+    finally:
+        if rule_registry is not None:
+            rule_registry.save()
 
-            result = scrape_visit_duration_selenium(driver, url)
-            results.append(result)
+    print(f"\n🔒 Browsers closed ({pool.drivers_started} started, {pool.crashes} crashes)")
 
-            # Random wait between requests
-            if i < len(urls):
-                wait_time = random.uniform(5, 10)
-                print(f"\n⏳ Waiting {wait_time:.1f}s before next request...")
-                time.sleep(wait_time)
+def scrape_multiple_attractions(urls, **options):
+    """
+    Scrape multiple attractions and return the results as a list
+    options: see iter_attractions
+    """
+    results = []
 
-    finally:
-        print("\n🔒 Closing browser...")
-        driver.quit()
+    for i, result in enumerate(iter_attractions(urls, **options), 1):
+        log.debug("Processed %d attractions", i)
+        results.append(result)
 
     return results
 
 def save_to_csv(results, filename='stockholm_attractions_selenium.csv'):
     """
     Save results to CSV file
+    results: list of result dicts or a ResultsStore to export
     """
-    with open(filename, 'w', newline='', encoding='utf-8-sig') as file:
-        writer = csv.DictWriter(file, fieldnames=['name', 'url', 'duration', 'success'])
-        writer.writeheader()
-        writer.writerows(results)
+    export_csv(results, filename)
 
     print(f"\n💾 Data saved to: {filename}")
 
 # ===== MAIN =====
 if __name__ == "__main__":
+    # Per-URL progress is logged at DEBUG; use logging.DEBUG to see it
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     print("=" * 60)
     print("🕷️  TripAdvisor Selenium Scraper - Stockholm Attractions")
     print("=" * 60)
@@ -236,21 +333,31 @@ if __name__ == "__main__":
     print("\n Settings:")
     print("   - Browser: Chrome")
     print("   - Headless: No (you'll see the browser window)")
-    print("   - Delays: 5-10 seconds between requests")
+    print("   - Rate limit: one page every 5-10 seconds across all browsers")
 
     # Choose headless mode
     print("\n❓ Run in headless mode (no browser window)?")
     print("   Recommended: No (easier to see what's happening)")
     headless_mode = False  # Set to True to run without browser window
+    pool_size = 1  # Browsers rendering at once (use more with headless_mode)
+    lean_mode = False  # Set to True to block images/fonts and skip fixed sleeps
 
     # Start scraping
     print("\n🎬 Starting in 3 seconds...")
     time.sleep(3)
 
-    results = scrape_multiple_attractions(stockholm_urls, headless=headless_mode)
+    # Results are committed one by one, so an interrupted run picks up
+    # where it stopped
+    store = ResultsStore('stockholm_attractions.sqlite')
+
+    scrape_multiple_attractions(stockholm_urls, headless=headless_mode, pool_size=pool_size,
+                                lean=lean_mode, store=store)
 
-    # Save to CSV
-    save_to_csv(results)
+    # Export to CSV
+    save_to_csv(store)
+    METRICS.write_report()
+    print("📊 Stage timings and counters saved to scrape_metrics.json / scrape_metrics.prom")
+    results = list(store.rows())
 
     # Print summary
     print("\n" + "=" * 60)
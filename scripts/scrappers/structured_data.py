@@ -0,0 +1,179 @@
+"""
+Structured-data fast path for duration extraction
+
+Pulls JSON-LD blocks and embedded page-state JSON straight out of the raw
+HTML with a regex scan (no DOM), decodes them with orjson when it is
+installed, and looks for duration and name fields. When that finds a
+duration the DOM heuristics in duration_extractor are skipped entirely.
+"""
+
+import json
+import re
+
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# Patterns start at the literal type value so the regex engine can skip
+# straight to candidate positions instead of trying every <script tag
+_JSON_LD_RE = re.compile(r'application/ld\+json["\'][^>]*>(.*?)</script>', re.S)
+_JSON_SCRIPT_RE = re.compile(r'type=["\']application/json["\'][^>]*>(.*?)</script>', re.S)
+# window.__WEB_CONTEXT__ = {...};  /  window.__INITIAL_STATE__={...}
+_STATE_ASSIGNMENT_RE = re.compile(r'window\.__[A-Za-z0-9_]+__\s*=\s*(?=[{\[])')
+
+DURATION_KEYS = frozenset([
+    'duration', 'timerequired', 'suggestedduration', 'visitduration',
+    'recommendedduration', 'durationtext', 'suggested_duration', 'lengthofvisit',
+])
+NAME_TYPES = frozenset([
+    'touristattraction', 'landmarksorhistoricalbuildings', 'museum', 'place',
+    'localbusiness', 'park', 'zoo', 'church', 'placeofworship', 'attraction',
+])
+
+_ISO_DURATION_RE = re.compile(r'^P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?)?$', re.I)
+_TIME_TEXT_RE = re.compile(r'(\d+[-–]\d+|\d+)\s*(hour|hr|minute|min)s?', re.I)
+
+_raw_decoder = json.JSONDecoder()
+
+
+def _decode(text):
+    try:
+        return _loads(text)
+    except ValueError:
+        return None
+
+
+def iter_json_blocks(html):
+    """
+    Yield (source, data) for every JSON-LD block and every embedded state
+    blob that mentions a duration
+    """
+    for match in _JSON_LD_RE.finditer(html):
+        data = _decode(match.group(1).strip())
+        if data is not None:
+            yield 'json-ld', data
+
+    for match in _JSON_SCRIPT_RE.finditer(html):
+        text = match.group(1)
+        if 'uration' in text:
+            data = _decode(text.strip())
+            if data is not None:
+                yield 'embedded-state', data
+
+    for match in _STATE_ASSIGNMENT_RE.finditer(html):
+        # Only pay for decoding when the blob can contain a duration
+        end = html.find('</script>', match.end())
+        if 'uration' not in html[match.end():end if end != -1 else None]:
+            continue
+        try:
+            data, _ = _raw_decoder.raw_decode(html, match.end())
+        except ValueError:
+            continue
+        yield 'embedded-state', data
+
+
+def format_duration_value(value):
+    """
+    Turn a structured duration value into the same kind of text the DOM
+    rules return ('1-2 hours', '90 minutes'), or None
+    """
+    if isinstance(value, dict):
+        for inner in value.values():
+            text = format_duration_value(inner)
+            if text:
+                return text
+        return None
+    if not isinstance(value, str):
+        return None
+
+    value = value.strip()
+    iso = _ISO_DURATION_RE.match(value)
+    if iso and any(iso.groups()):
+        days, hours, minutes = (int(part or 0) for part in iso.groups())
+        hours += days * 24
+        parts = []
+        if hours:
+            parts.append(f"{hours} hour{'s' if hours != 1 else ''}")
+        if minutes:
+            parts.append(f"{minutes} minute{'s' if minutes != 1 else ''}")
+        return ' '.join(parts)
+
+    time_match = _TIME_TEXT_RE.search(value)
+    return time_match.group(0) if time_match else None
+
+
+def find_fields(data):
+    """
+    Walk decoded JSON and return (name, duration); either may be None.
+    The name comes from the object holding the duration when it has one,
+    otherwise from the first attraction-like typed object.
+    """
+    name = None
+    duration = None
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+            continue
+        if not isinstance(node, dict):
+            continue
+
+        node_duration = None
+        for key, value in node.items():
+            if key.lower() in DURATION_KEYS:
+                node_duration = format_duration_value(value)
+                if node_duration:
+                    break
+
+        node_type = node.get('@type')
+        types = node_type if isinstance(node_type, list) else [node_type]
+        node_name = node.get('name') if isinstance(node.get('name'), str) else None
+
+        if node_duration and duration is None:
+            duration = node_duration
+            if node_name:
+                name = node_name
+        if name is None and node_name and any(
+            isinstance(t, str) and t.lower() in NAME_TYPES for t in types
+        ):
+            name = node_name
+
+        if duration and name:
+            break
+        stack.extend(value for value in node.values() if isinstance(value, (dict, list)))
+
+    return name, duration
+
+
+def extract_structured(html):
+    """
+    Return {'name', 'duration', 'rule'} from structured data; name and
+    duration are None when not present
+    """
+    if isinstance(html, bytes):
+        html = html.decode('utf-8', errors='replace')
+
+    name = None
+    for source, data in iter_json_blocks(html):
+        block_name, duration = find_fields(data)
+        name = name or block_name
+        if duration:
+            return {'name': name, 'duration': duration, 'rule': source}
+    return {'name': name, 'duration': None, 'rule': None}
+
+
+def extract_json(text):
+    """
+    Return {'name', 'duration', 'rule'} from one JSON document, e.g. an API
+    response the page loaded; name and duration are None when not present
+    """
+    if isinstance(text, bytes):
+        text = text.decode('utf-8', errors='replace')
+    data = _decode(text.strip())
+    if data is None:
+        return {'name': None, 'duration': None, 'rule': None}
+    name, duration = find_fields(data)
+    return {'name': name, 'duration': duration, 'rule': 'network' if duration else None}
@@ -0,0 +1,290 @@
+"""
+Tiered scraper: plain HTTP first, a real browser only when it is needed
+
+Every URL is fetched with requests (scraper2's headers, cache, retry policy
+and rate limit). A page only goes on to the rendering queue served by the
+Selenium browser pool when the static HTML has no duration and looks
+rendered client-side (no h1, or an app shell waiting for JavaScript).
+Results from both tiers come out of one stream, and the number of URLs each
+tier finished is counted so the browser pool can be sized.
+Usage: python3 tiered_scraper.py
+"""
+
+import logging
+import queue
+import re
+from collections import Counter
+from functools import partial
+
+import requests
+
+import scraper2
+from duration_extractor import FULL_RULES
+from fetch_engine import HostRateLimiter, run_concurrently
+from metrics import METRICS
+from results_store import ResultsStore, export_csv
+from retry_policy import RetryPolicy, RetryableError
+from rule_registry import adaptive_extract
+
+log = logging.getLogger(__name__)
+
+# Signs that the served HTML is a shell the browser fills in with JavaScript
+# (not __WEB_CONTEXT__: every server-rendered TripAdvisor page carries it)
+CLIENT_RENDER_MARKERS = re.compile(
+    rb'id=["\'](?:__next|root|app)["\']\s*>\s*</div>|data-reactroot|__INITIAL_STATE__'
+    rb'|<noscript>[^<]*(?:enable|requires?) JavaScript',
+    re.I,
+)
+NO_NAME = 'Unknown attraction'
+
+# Returned by the HTTP tier for a page that has to be rendered
+RENDER = object()
+
+
+def needs_render(html, extracted):
+    """
+    True when the static page has no duration because it is rendered
+    client-side: the h1 is missing or the page carries an app shell
+    """
+    if extracted['duration']:
+        return False
+    if extracted['name'] == NO_NAME:
+        return True
+    if isinstance(html, str):
+        html = html.encode('utf-8', errors='replace')
+    return CLIENT_RENDER_MARKERS.search(html) is not None
+
+
+def scrape_static(url, cache=None, rate_limiter=None, capture_store=None, retry_policy=None,
+                  rule_registry=None):
+    """
+    HTTP tier: scraper2.scrape_visit_duration, except that pages which need
+    a browser return RENDER instead of a failed result
+    """
+    try:
+        response = scraper2.fetch_page(url, cache, rate_limiter, retry_policy)
+
+        if capture_store is not None:
+            capture_store.capture(url, response.content, {
+                'status': response.status_code,
+                'from_cache': getattr(response, 'from_cache', False),
+                'content_type': response.headers.get('Content-Type'),
+                'tier': 'http',
+            })
+
+        extracted = adaptive_extract(response.content, url, rule_registry, FULL_RULES,
+                                     default_name=NO_NAME)
+        if needs_render(response.content, extracted):
+            log.debug("  🖥️  No duration in the static page, queueing for the browser")
+            return RENDER
+        return scraper2.page_result(url, extracted)
+
+    except requests.exceptions.HTTPError as e:
+        return scraper2.http_failed(url, e)
+    except requests.exceptions.RequestException as e:
+        return scraper2.request_failed(url, e)
+    except RetryableError:
+        raise
+    except Exception as e:
+        return scraper2.parse_failed(url, e)
+
+
+class TieredScraper:
+    """
+    max_workers: concurrent HTTP fetches
+    pool_size: browsers serving the rendering queue (started on first use)
+    requests_per_second / jitter: one per-host budget shared by both tiers
+    cache, capture_store, rule_registry: shared by both tiers
+    retry_policy: RetryPolicy for the HTTP tier (default: RetryPolicy())
+    escalate_blocked: render URLs the HTTP tier gave up on after 403s
+    headless / lean / max_pages_per_driver / driver_path / offline /
+    capture_network: see selenium_scraper
+    rate_limiter: HostRateLimiter shared with other crawlers of the same
+    host (e.g. discovery); replaces requests_per_second / jitter
+    """
+
+    def __init__(self, max_workers=4, pool_size=1, requests_per_second=1/10, jitter=5, cache=None,
+                 capture_store=None, retry_policy=None, rule_registry=None, escalate_blocked=False,
+                 headless=True, lean=True, max_pages_per_driver=50, driver_path=None, offline=False,
+                 capture_network=False, rate_limiter=None):
+        self.max_workers = max_workers
+        self.pool_size = pool_size
+        self.cache = cache
+        self.capture_store = capture_store
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.rule_registry = rule_registry
+        self.escalate_blocked = escalate_blocked
+        self.headless = headless
+        self.lean = lean
+        self.max_pages_per_driver = max_pages_per_driver
+        self.driver_path = driver_path
+        self.offline = offline
+        self.capture_network = capture_network
+        self.rate_limiter = rate_limiter or HostRateLimiter(requests_per_second, jitter=jitter)
+        # URLs finished per tier ('http', 'browser')
+        self.tier_counts = Counter()
+
+    def _finished(self, tier, result):
+        self.tier_counts[tier] += 1
+        METRICS.count('results', tier=tier, success=result['success'])
+
+    def _give_up(self, url, error):
+        if self.escalate_blocked and error.status == 403:
+            return RENDER
+        return scraper2.give_up(url, error)
+
+    def _start_browsers(self, work, rendered):
+        # Selenium is only imported once a page actually needs a browser
+        import selenium_scraper
+        from browser_pool import BrowserPool
+
+        print(f"\n🚀 Starting {self.pool_size} browser(s) for client-rendered pages...")
+        pool = BrowserPool(
+            partial(selenium_scraper.setup_driver, headless=self.headless, lean=self.lean,
+                    driver_path=self.driver_path, offline=self.offline, capture_network=self.capture_network),
+            size=self.pool_size,
+            max_pages_per_driver=self.max_pages_per_driver,
+            rate_limiter=self.rate_limiter,
+        )
+        # The HTTP cache holds the static page under the same URL, which is
+        # exactly what the browser is meant to replace, so renders skip it
+        scrape = partial(selenium_scraper.scrape_visit_duration_selenium, cache=None, lean=self.lean,
+                         capture_store=self.capture_store, rule_registry=self.rule_registry,
+                         capture_network=self.capture_network)
+        return pool, pool.start(work, rendered, scrape, selenium_scraper.error_result)
+
+    def run(self, urls):
+        """
+        Yield (index, url, result) in completion order; index is the URL's
+        position in urls, so fetch_engine.in_order restores input order
+        """
+        scrape = partial(scrape_static, cache=self.cache, rate_limiter=self.rate_limiter,
+                         capture_store=self.capture_store, retry_policy=self.retry_policy,
+                         rule_registry=self.rule_registry)
+        work = queue.Queue()
+        rendered = queue.Queue()
+        pool = workers = None
+        pending_renders = 0
+
+        try:
+            for index, url, result in run_concurrently(urls, scrape, self.max_workers,
+                                                       retry_policy=self.retry_policy,
+                                                       on_give_up=self._give_up):
+                if result is RENDER:
+                    if pool is None:
+                        pool, workers = self._start_browsers(work, rendered)
+                    work.put((index, url, 0))
+                    pending_renders += 1
+                else:
+                    self._finished('http', result)
+                    yield index, url, result
+
+                # Hand over renders that finished while HTTP pages were coming in
+                while pending_renders:
+                    try:
+                        item = rendered.get_nowait()
+                    except queue.Empty:
+                        break
+                    pending_renders -= 1
+                    self._finished('browser', item[2])
+                    yield item
+
+            while pending_renders:
+                item = rendered.get()
+                pending_renders -= 1
+                self._finished('browser', item[2])
+                yield item
+        finally:
+            if pool is not None:
+                pool.stop(work, workers)
+                print(f"🔒 Browsers closed ({pool.drivers_started} started, {pool.crashes} crashes)")
+
+    def report(self):
+        """
+        Print how many URLs each tier handled
+        """
+        total = sum(self.tier_counts.values())
+        http = self.tier_counts['http']
+        browser = self.tier_counts['browser']
+        print("\n📊 Tier usage:")
+        print(f"   HTTP:    {http}/{total}")
+        print(f"   Browser: {browser}/{total}" + (f" ({browser / total:.0%} escalated)" if total else ""))
+
+
+def iter_attractions(urls, store=None, **options):
+    """
+    Scrape attractions with the tiered scheduler, yielding each result as
+    soon as either tier finishes it (completion order, not URL order)
+    store: optional ResultsStore, each result is committed as it arrives and
+    URLs that already succeeded are skipped, so an interrupted run resumes
+    options: see TieredScraper; the tier counts are printed at the end
+    """
+    if store is not None:
+        urls = store.pending(urls)
+    scraper = TieredScraper(**options)
+    try:
+        for _, _, result in scraper.run(urls):
+            if store is not None:
+                store.record(result)
+            yield result
+    finally:
+        if scraper.rule_registry is not None:
+            scraper.rule_registry.save()
+        scraper.report()
+
+
+def scrape_multiple_attractions(urls, **options):
+    """
+    Scrape multiple attractions and return the results as a list
+    options: see iter_attractions
+    """
+    results = []
+
+    for i, result in enumerate(iter_attractions(urls, **options), 1):
+        log.debug("Processed %d attractions", i)
+
+        results.append(result)
+
+        log.debug("📍 Attraction: %s", result['name'])
+        log.debug("⏱️  Duration: %s", result['duration'])
+
+    return results
+
+
+def save_to_csv(results, filename='stockholm_attractions_tiered.csv'):
+    """
+    Save results to CSV file
+    results: list of result dicts or a ResultsStore to export
+    """
+    export_csv(results, filename)
+
+    print(f"\n💾 Data saved to: {filename}")
+
+
+# ===== MAIN =====
+if __name__ == "__main__":
+    # Per-URL progress is logged at DEBUG; use logging.DEBUG to see it
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    print("=" * 60)
+    print("🕷️  TripAdvisor Tiered Scraper - Stockholm Attractions")
+    print("=" * 60)
+
+    stockholm_urls = [
+        "https://www.tripadvisor.com/Attraction_Review-g189852-d243851-Reviews-Vasa_Museum-Stockholm.html",
+        "https://www.tripadvisor.com/Attraction_Review-g189852-d195439-Reviews-Skansen-Stockholm.html",
+        "https://www.tripadvisor.com/Attraction_Review-g189852-d4454428-Reviews-ABBA_The_Museum-Stockholm.html",
+    ]
+
+    print(f"📊 Total attractions to scrape: {len(stockholm_urls)}\n")
+
+    store = ResultsStore('stockholm_attractions.sqlite')
+
+    scrape_multiple_attractions(stockholm_urls, store=store, pool_size=1, escalate_blocked=True)
+
+    save_to_csv(store)
+    METRICS.write_report()
+    print("📊 Stage timings and counters saved to scrape_metrics.json / scrape_metrics.prom")
+    results = list(store.rows())
+    success_count = sum(1 for r in results if r['success'])
+    print(f"\n✅ Successfully scraped: {success_count}/{len(results)} attractions")
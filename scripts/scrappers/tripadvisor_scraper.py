@@ -1,12 +1,21 @@
+import logging
 import requests
-from bs4 import BeautifulSoup
-import re
-import csv
-import time
+from functools import partial
+from http_cache import cached_get
+from duration_extractor import BASIC_RULES
+from rule_registry import adaptive_extract
+from results_store import export_csv
+from fetch_engine import HostRateLimiter, scrape_in_order
+from metrics import METRICS
 
-def scrape_visit_duration(url):
+log = logging.getLogger(__name__)
+
+def scrape_visit_duration(url, cache=None, rate_limiter=None, rule_registry=None):
     """"
-    scrape visit duration from attraction page"""
+    scrape visit duration from attraction page
+    cache: optional HttpCache, fresh pages are served from disk
+    rate_limiter: optional HostRateLimiter, skipped for cache hits
+    rule_registry: optional RuleRegistry that narrows the rules to a dominant one first"""
 
     # simulate browser request
     headers = {
@@ -17,52 +26,27 @@ def scrape_visit_duration(url):
 
     try:
         #sending request
-        print(f"accessing: {url}")
-        response = requests.get(url,
-                                headers=headers,
-                                timeout= 10)
+        log.debug("accessing: %s", url)
+        response = cached_get(requests, url, cache,
+                              headers=headers,
+                              timeout= 10,
+                              rate_limiter=rate_limiter)
         response.raise_for_status()
 
-        # HTML parsing
-        soup = BeautifulSoup(response.content, 'html.parser')
-
-        # method 1: search for duration or suggest visit time
-        duration = None
-
-        possible_selectors = [
-            {'data-test-target': 'duration'},
-            {'class' : 'duration'},
-            {'class': re.compile('duration', re.I)}
-        ]
-
-        for selector in possible_selectors:
-            element = soup.find('div', selector)
-            if element:
-                duration = element.get_text(strip=True)
-                break
-
-        # method 2: search for relevant words
-        if not duration:
-            keywords = ['Duration']
-            for keyword in keywords:
-                element = soup.find(text=re.compile(keyword, re.I))
-                if element:
-                    parent = element.find_parent()
-                    if parent:
-                        duration = parent.get_text(strip=True)
-                        break
-
-
-        title = soup.find('h1')
-        attraction_name = title.get_text(strip = True) if title else "unknown tourist spots"
+        # single-pass extraction: selector rules, the 'Duration' keyword and
+        # the h1 name are all evaluated while the page is parsed once
+        extracted = adaptive_extract(response.content, url, rule_registry, BASIC_RULES,
+                                     default_name="unknown tourist spots")
+        duration = extracted['duration']
+
         return {
-            'name': attraction_name,
+            'name': extracted['name'],
             'url': url,
             'duration': duration if duration else 'no visit duration data found',
             'success': bool(duration)
         }
     except requests.exceptions.RequestException as e:
-        print(f"failed request: {e}")
+        log.debug("failed request: %s", e)
         return {
             'name': 'failed request',
             'url': url,
@@ -70,7 +54,7 @@ def scrape_visit_duration(url):
             'success': False
         }
     except Exception as e:
-        print(f"failed parsing: {e}")
+        log.debug("failed parsing: %s", e)
         return {
             'name': 'error',
             'url': url,
@@ -79,27 +63,57 @@ def scrape_visit_duration(url):
         }
 
 
-def scrape_multiple_attractions(urls):
+def iter_attractions(urls, max_workers=4, requests_per_second=1/3, cache=None, store=None,
+                     rule_registry=None, rate_limiter=None):
+    """
+    scrape attractions concurrently, yielding each result in url order as
+    soon as it is ready (urls can be any iterable, nothing is kept in memory)
+    max_workers: number of requests kept in flight
+    requests_per_second: shared budget per host (default matches the old 3s wait)
+    cache: optional HttpCache shared by all workers
+    store: optional ResultsStore, each result is committed as soon as it
+    finishes and urls that already succeeded are skipped
+    rule_registry: optional RuleRegistry, saved when the run finishes
+    rate_limiter: HostRateLimiter shared with other crawlers of the same
+    host (e.g. discovery); replaces requests_per_second
+    """
+    if store is not None:
+        urls = store.pending(urls)
+    if rate_limiter is None:
+        rate_limiter = HostRateLimiter(requests_per_second)
+    scrape = partial(scrape_visit_duration, cache=cache, rate_limiter=rate_limiter,
+                     rule_registry=rule_registry)
+
+    try:
+        for result in scrape_in_order(urls, scrape, max_workers,
+                                      on_result=store.record if store is not None else None):
+            METRICS.count('results', tier='http', success=result['success'])
+            yield result
+    finally:
+        if rule_registry is not None:
+            rule_registry.save()
+
+
+def scrape_multiple_attractions(urls, **options):
+    """
+    scrape several attractions and return the results as a list
+    options: see iter_attractions
+    """
     results = []
 
-    for i, url in enumerate(urls, 1):
-        print(f"\nprocessing the {i}th/{len(urls)} spots...")
-        result = scrape_visit_duration(url)
+    for i, result in enumerate(iter_attractions(urls, **options), 1):
+        log.debug("processed %d spots...", i)
         results.append(result)
 
-        print(f"spots: {result['name']}")
-        print(f"visit duration: {result['duration']}")
-        # wait for 3 second
-        if i < len(urls):
-            time.sleep(3)
+        log.debug("spots: %s", result['name'])
+        log.debug("visit duration: %s", result['duration'])
     return results
 
 
 def save_to_csv(results, filename='tripadvisor_duration.csv'):
-    with open(filename, 'w', newline = '', encoding='utf-8-sig') as file:
-        writer = csv.DictWriter(file, fieldnames=['name', 'url', 'duration', 'success'])
-        writer.writeheader()
-        writer.writerows(results)
+    """
+    results: list of result dicts or a ResultsStore to export"""
+    export_csv(results, filename)
 
     print(f"\nscrape data saved to: {filename}")
 
@@ -0,0 +1,27 @@
+"""
+Helpers for TripAdvisor attraction URLs
+"""
+
+import re
+
+# .../Attraction_Review-g189852-d243851-Reviews-Vasa_Museum-Stockholm.html
+ATTRACTION_URL_RE = re.compile(r'Attraction_Review-g(\d+)-d(\d+)')
+
+
+def parse_attraction_url(url):
+    """
+    Return (geo_id, location_id) as ints, or None for other URLs
+    """
+    match = ATTRACTION_URL_RE.search(url)
+    if not match:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def attraction_key(url):
+    """
+    Stable key for an attraction: 'd243851' when the URL has a TripAdvisor
+    location id, otherwise the URL itself
+    """
+    parsed = parse_attraction_url(url)
+    return f"d{parsed[1]}" if parsed else url
@@ -0,0 +1,399 @@
+"""
+Lease-based work queue for crawling with several processes or machines
+
+URLs live in one SQLite file. Workers lease batches of them for a limited
+time, renew the lease while they scrape, write results to their own JSONL
+partition and then mark the batch done. A worker that is killed simply
+stops renewing: once its lease expires the URLs go back to the queue for
+another worker. A completion from a worker whose lease has already passed
+to someone else is ignored, and the merge step keeps one row per
+attraction, preferring a success, so nothing is lost or counted twice.
+
+Workers can run on different machines that share the queue file. WAL mode
+does not work on network filesystems, so pass --no-wal there.
+Usage:
+    python3 work_queue.py enqueue urls.txt
+    python3 work_queue.py run --processes 4
+    python3 work_queue.py worker --id node2-a        (on another machine)
+    python3 work_queue.py merge --output stockholm_attractions_duration.csv
+"""
+
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from metrics import METRICS
+from result_sinks import JsonlSink, open_sink
+from results_store import ResultsStore
+from tripadvisor_urls import attraction_key
+
+log = logging.getLogger(__name__)
+
+
+class WorkQueue:
+    """
+    path: SQLite queue file, shared by every worker
+    lease_seconds: how long a leased batch stays reserved without a renewal
+    wal: WAL journal (faster; only on local filesystems)
+    """
+
+    def __init__(self, path='crawl_queue.sqlite', lease_seconds=300, wal=True):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        # Autocommit mode: every write below runs in an explicit BEGIN IMMEDIATE
+        self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._db.execute(f"PRAGMA journal_mode={'WAL' if wal else 'DELETE'}")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS work (
+                key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                state TEXT NOT NULL DEFAULT 'pending',
+                lease_owner TEXT,
+                lease_expires REAL,
+                leases INTEGER NOT NULL DEFAULT 0,
+                success INTEGER,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS work_state ON work (state, lease_expires)")
+
+    def _transaction(self, fn):
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._db)
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def enqueue(self, urls, batch_size=1000):
+        """
+        Add URLs (any iterable); attractions already queued are skipped.
+        Returns how many were new.
+        """
+        added = 0
+        batch = []
+
+        def insert(db):
+            before = db.total_changes
+            db.executemany(
+                "INSERT OR IGNORE INTO work (key, url, updated_at) VALUES (?, ?, ?)", batch
+            )
+            return db.total_changes - before
+
+        for url in urls:
+            batch.append((attraction_key(url), url, time.time()))
+            if len(batch) >= batch_size:
+                added += self._transaction(insert)
+                batch = []
+        if batch:
+            added += self._transaction(insert)
+        return added
+
+    def lease(self, worker_id, batch_size=50):
+        """
+        Reserve up to batch_size pending URLs (expired leases included) for
+        worker_id; returns the URLs, empty when nothing is left to lease
+        """
+        def take(db):
+            now = time.time()
+            rows = db.execute(
+                """
+                SELECT key, url FROM work
+                WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?)
+                LIMIT ?
+                """,
+                (now, batch_size),
+            ).fetchall()
+            db.executemany(
+                """
+                UPDATE work SET state = 'leased', lease_owner = ?, lease_expires = ?,
+                    leases = leases + 1, updated_at = ?
+                WHERE key = ?
+                """,
+                [(worker_id, now + self.lease_seconds, now, key) for key, _ in rows],
+            )
+            return [url for _, url in rows]
+
+        urls = self._transaction(take)
+        METRICS.count('leases', worker=worker_id)
+        return urls
+
+    def renew(self, worker_id):
+        """
+        Extend every lease worker_id still holds; returns how many
+        """
+        def extend(db):
+            now = time.time()
+            return db.execute(
+                """
+                UPDATE work SET lease_expires = ?, updated_at = ?
+                WHERE state = 'leased' AND lease_owner = ? AND lease_expires >= ?
+                """,
+                (now + self.lease_seconds, now, worker_id, now),
+            ).rowcount
+
+        return self._transaction(extend)
+
+    def complete(self, worker_id, results):
+        """
+        Mark scraped URLs done. URLs whose lease has moved to another worker
+        are left alone; returns how many were accepted.
+        """
+        def finish(db):
+            now = time.time()
+            accepted = 0
+            for result in results:
+                accepted += db.execute(
+                    """
+                    UPDATE work SET state = 'done', success = ?, lease_owner = NULL,
+                        lease_expires = NULL, updated_at = ?
+                    WHERE key = ? AND state = 'leased' AND lease_owner = ?
+                    """,
+                    (1 if result['success'] else 0, now, attraction_key(result['url']), worker_id),
+                ).rowcount
+            return accepted
+
+        return self._transaction(finish)
+
+    def release(self, worker_id):
+        """
+        Hand back every URL worker_id holds (clean shutdown)
+        """
+        def give_back(db):
+            return db.execute(
+                """
+                UPDATE work SET state = 'pending', lease_owner = NULL, lease_expires = NULL, updated_at = ?
+                WHERE state = 'leased' AND lease_owner = ?
+                """,
+                (time.time(), worker_id),
+            ).rowcount
+
+        return self._transaction(give_back)
+
+    def next_expiry(self):
+        """
+        When the earliest lease still held runs out, or None when no URL is leased
+        """
+        with self._lock:
+            (expires,) = self._db.execute(
+                "SELECT MIN(lease_expires) FROM work WHERE state = 'leased'"
+            ).fetchone()
+        return expires
+
+    def counts(self):
+        """
+        {'pending', 'leased', 'expired', 'done', 'succeeded'}
+        """
+        with self._lock:
+            now = time.time()
+            row = self._db.execute(
+                """
+                SELECT
+                    SUM(state = 'pending'),
+                    SUM(state = 'leased' AND lease_expires >= ?),
+                    SUM(state = 'leased' AND lease_expires < ?),
+                    SUM(state = 'done'),
+                    SUM(state = 'done' AND success = 1)
+                FROM work
+                """,
+                (now, now),
+            ).fetchone()
+        return dict(zip(['pending', 'leased', 'expired', 'done', 'succeeded'], [value or 0 for value in row]))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def run_worker(queue_path='crawl_queue.sqlite', worker_id=None, partition_dir='partitions', batch_size=50,
+               lease_seconds=300, wal=True, scrape_batch=None, **scrape_options):
+    """
+    Lease batches until every URL is done. Results go to
+    partition_dir/<worker_id>.jsonl and are flushed before the batch is
+    marked done; a background thread renews the leases meanwhile.
+    scrape_batch: callable(urls, **scrape_options) yielding results
+    (default: scraper2.iter_attractions)
+    Returns how many URLs this worker completed.
+    """
+    if scrape_batch is None:
+        import scraper2
+        scrape_batch = scraper2.iter_attractions
+    worker_id = worker_id or default_worker_id()
+    work = WorkQueue(queue_path, lease_seconds, wal)
+    os.makedirs(partition_dir, exist_ok=True)
+    sink = JsonlSink(os.path.join(partition_dir, f"{worker_id}.jsonl"), flush_every=batch_size)
+
+    stop = threading.Event()
+
+    def keep_leases():
+        while not stop.wait(lease_seconds / 3):
+            work.renew(worker_id)
+
+    renewer = threading.Thread(target=keep_leases, name='lease-renewer', daemon=True)
+    renewer.start()
+
+    completed = 0
+    try:
+        while True:
+            urls = work.lease(worker_id, batch_size)
+            if not urls:
+                # Other workers still hold leases: wait in case one of them
+                # dies and its batch comes back to the queue
+                expires = work.next_expiry()
+                if expires is None:
+                    break
+                time.sleep(min(max(0.0, expires - time.time()) + 0.1, 5.0))
+                continue
+            log.info("📦 %s leased %d URLs", worker_id, len(urls))
+            results = []
+            for result in scrape_batch(urls, **scrape_options):
+                sink.write(result)
+                results.append(result)
+            # Results are durable before the queue hears about them: a crash
+            # in between means a re-scrape, never a lost result
+            sink.flush()
+            completed += work.complete(worker_id, results)
+    finally:
+        stop.set()
+        renewer.join()
+        work.release(worker_id)
+        sink.close()
+        work.close()
+    log.info("✅ %s finished %d URLs", worker_id, completed)
+    return completed
+
+
+def _worker_process(worker_id, options):
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    run_worker(worker_id=worker_id, **options)
+
+
+def run_local_workers(processes=4, **options):
+    """
+    Start processes workers on this machine and wait for all of them
+    options: see run_worker
+    """
+    host = socket.gethostname()
+    workers = [
+        multiprocessing.Process(target=_worker_process, args=(f"{host}-w{i}", options))
+        for i in range(processes)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+def iter_partition(path):
+    """
+    Result dicts from one partition; a torn last line (killed worker) is skipped
+    """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                log.warning("  ⚠️  Skipping damaged line in %s", path)
+
+
+def merge_partitions(partition_dir='partitions', store_path='merged_results.sqlite', output=None):
+    """
+    Fold every worker partition into one ResultsStore (one row per
+    attraction, a success is never replaced by a failure) and optionally
+    write it to output (.csv, .jsonl or .parquet). The sinks append, so
+    output is written as a fresh file next to it and renamed over the old
+    one; merging twice gives the same file.
+    Returns the store.
+    """
+    store = ResultsStore(store_path)
+    for path in sorted(glob.glob(os.path.join(partition_dir, '*.jsonl'))):
+        for result in iter_partition(path):
+            store.record(result)
+    if output:
+        stem, extension = os.path.splitext(output)
+        tmp_path = f"{stem}.tmp{extension}"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        with open_sink(tmp_path) as sink:
+            for row in store.rows():
+                sink.write(row)
+        os.replace(tmp_path, output)
+    return store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Lease-based crawl queue')
+    parser.add_argument('--queue', default='crawl_queue.sqlite', help='shared SQLite queue file')
+    parser.add_argument('--no-wal', action='store_true', help='use on network filesystems')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    enqueue = commands.add_parser('enqueue', help='add URLs (one per line) to the queue')
+    enqueue.add_argument('file')
+
+    for name in ('worker', 'run'):
+        command = commands.add_parser(name, help='scrape leased batches' if name == 'worker'
+                                      else 'start several local workers')
+        command.add_argument('--partitions', default='partitions')
+        command.add_argument('--batch-size', type=int, default=50)
+        command.add_argument('--lease-seconds', type=float, default=300)
+        command.add_argument('--workers', type=int, default=4, help='concurrent requests per process')
+        command.add_argument('--requests-per-second', type=float, default=1/10,
+                             help='per process: divide the crawl budget by the number of processes')
+        if name == 'worker':
+            command.add_argument('--id', help='worker id (default: host-pid)')
+        else:
+            command.add_argument('--processes', type=int, default=4)
+
+    merge = commands.add_parser('merge', help='merge worker partitions')
+    merge.add_argument('--partitions', default='partitions')
+    merge.add_argument('--store', default='merged_results.sqlite')
+    merge.add_argument('--output', default='stockholm_attractions_duration.csv')
+
+    commands.add_parser('status', help='show queue counts')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    if args.command == 'enqueue':
+        work = WorkQueue(args.queue, wal=not args.no_wal)
+        with open(args.file, encoding='utf-8') as f:
+            added = work.enqueue(line.strip() for line in f if line.strip())
+        print(f"📥 {added} new URLs queued ({work.counts()['pending']} pending)")
+        work.close()
+    elif args.command in ('worker', 'run'):
+        options = dict(queue_path=args.queue, partition_dir=args.partitions, batch_size=args.batch_size,
+                       lease_seconds=args.lease_seconds, wal=not args.no_wal, max_workers=args.workers,
+                       requests_per_second=args.requests_per_second)
+        if args.command == 'worker':
+            run_worker(worker_id=args.id, **options)
+        else:
+            run_local_workers(args.processes, **options)
+    elif args.command == 'merge':
+        store = merge_partitions(args.partitions, args.store, args.output)
+        rows = sum(1 for _ in store.rows())
+        store.close()
+        print(f"💾 Merged {rows} attractions into {args.output}")
+    else:
+        work = WorkQueue(args.queue, wal=not args.no_wal)
+        print(json.dumps(work.counts(), indent=2))
+        work.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,7 @@ import { Ionicons } from '@expo/vector-icons';
 import { useTrip } from '../../contexts/TripContext';
 import googlePlacesService from '../../services/googlePlacesService';
 import { COLORS, SIZES } from '../../constants/config';
+import { getVisitDuration } from '../../utils/visitDurations';
 import { Linking, Touchable, TouchableOpacity } from 'react-native';
 import { ScrollView } from 'react-native';
 
@@ -62,7 +63,7 @@ const PlaceCard = ({place, onClose, visible}) => {
             ...place,
             ...placeDetails,
             location: resolvedLocation,
-            visitDuration: 60, // default duration 1 hour
+            visitDuration: getVisitDuration({ ...place, ...placeDetails }), // scraped duration, 1 hour by default
             addedAt: new Date().toISOString(),
         };
         saveToDay(placeToSave, day);
@@ -1,6 +1,7 @@
 import GoogleDirectionsService from './googleDirectionsService';
 import { formatTime, addMinutes } from '../utils/timeUtils';
 import { calculateDistance, sortByDistance } from '../utils/geoUtils';
+import { getVisitDuration } from '../utils/visitDurations';
 import GooglePlacesService from './googlePlacesService';
 
 
@@ -197,7 +198,7 @@ class RouteOptimizer {
             if (!openingHours){
                 constrainedRoute.push(place);
                 scheduledPlaces.set(place.id, currentTime);
-                currentTime = addMinutes(currentTime, place.visitDuration || 60);
+                currentTime = addMinutes(currentTime, getVisitDuration(place));
                 continue;
 
             }
@@ -209,7 +210,7 @@ class RouteOptimizer {
             currentTime = open;
             }
             // check if the visit can be fitted in before closing
-            const visitEnd = addMinutes(currentTime, place.visitDuration || 60);
+            const visitEnd = addMinutes(currentTime, getVisitDuration(place));
                   if (currentTime >= open && visitEnd <= close) {
                 constrainedRoute.push(place);
                 scheduledPlaces.set(place.id, currentTime);
@@ -244,7 +245,7 @@ class RouteOptimizer {
 
     for (let i = 0; i < places.length; i++) {
       const place = places[i];
-      const visitDuration = place.visitDuration || 60;
+      const visitDuration = getVisitDuration(place);
 
       // Add travel time from previous place
       let travelTime = 0;
@@ -436,7 +437,7 @@ class RouteOptimizer {
   }
     // Single place schedule
   createSinglePlaceSchedule(place, startTime) {
-    const visitDuration = place.visitDuration || 60;
+    const visitDuration = getVisitDuration(place);
     const arrivalTime = startTime;
     const departureTime = addMinutes(startTime, visitDuration);
 
@@ -496,7 +497,7 @@ class RouteOptimizer {
         currentTime = addMinutes(currentTime, this.defaultTravelTime + bufferTime);
       }
 
-      const visitDuration = place.visitDuration || 60;
+      const visitDuration = getVisitDuration(place);
       const arrivalTime = currentTime;
       const departureTime = addMinutes(currentTime, visitDuration);
 
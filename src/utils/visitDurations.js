@@ -0,0 +1,67 @@
+// utils/visitDurations.js
+// Visit durations scraped from TripAdvisor, bundled with the app.
+// The index is generated by scripts/scrappers/duration_index.py:
+// ids maps a TripAdvisor d-id to [typical, min, max] minutes,
+// names maps a normalised attraction name to its d-id.
+import bundledIndex from '../constants/visitDurations.json';
+
+export const DEFAULT_VISIT_DURATION = 60;
+
+let durationIndex = bundledIndex;
+
+// Letters NFKD leaves alone
+const FOLD = { ø: 'o', æ: 'ae', œ: 'oe', ß: 'ss', đ: 'd', ł: 'l', þ: 'th' };
+
+// Same folding as normalize_name() in duration_index.py:
+// "Rådhuset (Town Hall)" -> "radhuset town hall", "Søndermarken" -> "sondermarken"
+export const normalizePlaceName = (name) => {
+  return (name || '')
+    .normalize('NFKD')
+    .replace(/[\u0300-\u036f]/g, '')
+    .toLowerCase()
+    .replace(/[øæœßđłþ]/g, (letter) => FOLD[letter])
+    .replace(/[^a-z0-9]+/g, ' ')
+    .trim();
+};
+
+// [typical, min, max] minutes for a place, or null when it is not indexed
+export const lookupVisitDuration = (place, index = durationIndex) => {
+  if (!place) return null;
+  const tripadvisorId = place.tripadvisorId != null ? String(place.tripadvisorId) : null;
+  if (tripadvisorId && index.ids[tripadvisorId]) {
+    return index.ids[tripadvisorId];
+  }
+  const locationId = index.names[normalizePlaceName(place.name)];
+  return locationId ? index.ids[locationId] || null : null;
+};
+
+// Minutes to schedule for a place: a duration set on the place wins,
+// then the scraped typical duration, then the default
+export const getVisitDuration = (place) => {
+  if (place?.visitDuration) return place.visitDuration;
+  const durations = lookupVisitDuration(place);
+  return durations ? durations[0] : DEFAULT_VISIT_DURATION;
+};
+
+// Apply a delta downloaded for a newer crawl; returns the updated index
+export const applyDurationDelta = (delta, index = durationIndex) => {
+  if (delta.base_version !== index.version) {
+    throw new Error(`Duration delta applies to version ${delta.base_version}, index is at ${index.version}`);
+  }
+  const ids = { ...index.ids, ...delta.ids };
+  const names = { ...index.names, ...delta.names };
+  delta.removed_ids.forEach((key) => delete ids[key]);
+  delta.removed_names.forEach((key) => delete names[key]);
+
+  durationIndex = {
+    format: index.format,
+    version: delta.version,
+    generated_at: delta.generated_at,
+    count: Object.keys(ids).length,
+    ids,
+    names,
+  };
+  return durationIndex;
+};
+
+export const getDurationIndexVersion = () => durationIndex.version;